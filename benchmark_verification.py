@@ -0,0 +1,138 @@
+"""Compare the speed of verification with and without randomised sketches."""
+
+import argparse
+import os
+import time
+import typing
+
+from numpy import float64
+from numpy.typing import NDArray
+
+from defelement import settings
+from defelement.caching import array_hash
+from defelement.element import Categoriser
+from defelement.implementations import (
+    parse_example,
+    verification_preparations,
+    verifications,
+)
+from defelement.verification import VerificationInfo, verify
+
+
+def memoise(
+    tabulate: typing.Callable[[NDArray[float64]], NDArray[float64]],
+) -> typing.Callable[[NDArray[float64]], NDArray[float64]]:
+    """Memoise a tabulation function, so that only the linear algebra is timed.
+
+    Args:
+        tabulate: The tabulation function
+
+    Returns:
+        The memoised function
+    """
+    tables: dict[str, NDArray[float64]] = {}
+
+    def memoised(points: NDArray[float64]) -> NDArray[float64]:
+        key = array_hash(points)
+        if key not in tables:
+            tables[key] = tabulate(points)
+        return tables[key]
+
+    return memoised
+
+
+parser = argparse.ArgumentParser(
+    description="Compare the speed of verification with and without randomised sketches"
+)
+parser.add_argument("--test", metavar="test", default=None, help="Benchmark fewer elements.")
+parser.add_argument(
+    "--impl", metavar="impl", default=None, help="libraries to run the benchmark for"
+)
+parser.add_argument(
+    "--repeats", metavar="repeats", default="3", help="Number of times to time each example."
+)
+args = parser.parse_args()
+test_elements = None if args.test is None else args.test.split(",")
+test_implementations = None if args.impl is None else args.impl.split(",")
+repeats = int(args.repeats)
+
+categoriser = Categoriser()
+categoriser.load_references(os.path.join(settings.data_path, "references"))
+categoriser.load_families(os.path.join(settings.data_path, "families"))
+categoriser.load_folder(settings.element_path)
+
+installed = []
+for i in verifications:
+    if i != "symfem" and (test_implementations is None or i in test_implementations):
+        try:
+            verification_preparations[i]()
+            installed.append(i)
+        except ImportError:
+            print(f"{i} not installed")
+
+# Total time and number of examples for each mode and verdict
+times = {(sketch, v): 0.0 for sketch in [False, True] for v in [True, False]}
+counts = {True: 0, False: 0}
+mismatches = []
+for e in categoriser.elements:
+    if test_elements is not None and e.filename not in test_elements:
+        continue
+    for eg in e.examples:
+        reference, degree, variant, kwargs = parse_example(eg)
+        symfem_name, symfem_degree, symfem_params = e.get_implementation_string(
+            "symfem", reference, degree, variant
+        )
+        assert symfem_degree is not None
+        sym_edofs, sym_tabulate = verifications["symfem"](
+            symfem_name, reference, symfem_degree, symfem_params, e, eg
+        )
+        sym_tabulate = memoise(sym_tabulate)
+        for i in installed:
+            if i.startswith("*(") and i.endswith(")"):
+                input_code, output_code = i[2:-1].split(" -> ")
+                if e.implemented(output_code) or not e.implemented(input_code):
+                    continue
+            elif not e.implemented(i):
+                continue
+            else:
+                input_code = i
+            try:
+                impl_name, impl_degree, impl_params = e.get_implementation_string(
+                    input_code, reference, degree, variant
+                )
+                assert impl_degree is not None
+                edofs, tabulate = verifications[i](
+                    impl_name, reference, impl_degree, impl_params, e, eg
+                )
+                tabulate = memoise(tabulate)
+                # Tabulate once before timing
+                verify(reference, (edofs, tabulate), (sym_edofs, sym_tabulate))
+            # Examples that are not implemented or that raise errors are not benchmarked
+            except Exception:  # noqa: BLE001
+                continue
+
+            verdicts = {}
+            for sketch in [False, True]:
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    # New VerificationInfo objects are used so that no spans are reused
+                    verdicts[sketch] = verify(
+                        reference,
+                        VerificationInfo(edofs, tabulate),
+                        VerificationInfo(sym_edofs, sym_tabulate),
+                        sketch,
+                    )[0]
+                times[(sketch, verdicts[False])] += (time.perf_counter() - start) / repeats
+            counts[verdicts[False]] += 1
+            if verdicts[False] != verdicts[True]:
+                mismatches.append(f"{e.filename} {i} {eg}")
+
+for v, name in [(True, "passing"), (False, "failing")]:
+    print(
+        f"{counts[v]} {name} examples: {times[(False, v)]:.3f}s without sketches, "
+        f"{times[(True, v)]:.3f}s with sketches"
+    )
+print(f"Examples where the result changed: {len(mismatches)}")
+for m in mismatches:
+    print(f"  {m}")
+assert len(mismatches) == 0
@@ -19,6 +19,18 @@ from webtools.tools import (
 )
 
 from defelement import plotting, settings
+from defelement.caching import (
+    content_hash,
+    element_hash,
+    export_cache,
+    import_cache,
+    merge_statistics,
+    parse_size,
+    prefetch_cache,
+    statistics_report,
+    take_statistics,
+    tidy_cache,
+)
 from defelement.code_examples import generate_examples
 from defelement.element import Categoriser
 from defelement.examples import markup_example
@@ -37,15 +49,20 @@ def mkdir(folder):
         pass
 
 
-def build_example(eg: dict[str, typing.Any]):
+def build_example(eg: dict[str, typing.Any]) -> dict[str, tuple[int, int]]:
     """Build examples.
 
     Args:
         eg: Example
+
+    Returns:
+        Statistics about the cache lookups made while building the example
     """
     start = datetime.now()
 
     element = create_element(*eg["args"], **eg["kwargs"])
+    cache_hash = element_hash(eg["definition_hash"], element)
+    prefetch_cache(cache_hash)
 
     markup_example(
         element,
@@ -53,6 +70,7 @@ def build_example(eg: dict[str, typing.Any]):
         f"/elements/{eg['element_filename']}",
         eg["filename"],
         eg["legacy-filenames"] if "legacy-filenames" in eg else [],
+        cache_hash,
     )
 
     end = datetime.now()
@@ -61,6 +79,7 @@ def build_example(eg: dict[str, typing.Any]):
         f" (completed in {(end - start).total_seconds():.2f}s)",
         flush=True,
     )
+    return take_statistics()
 
 
 if __name__ == "__main__":
@@ -99,6 +118,39 @@ if __name__ == "__main__":
         help="Provide a verification JSON.",
     )
     parser.add_argument("--no-cache", action="store_true", help="Build without using cache.")
+    parser.add_argument(
+        "--cache-backend",
+        metavar="cache_backend",
+        default=None,
+        choices=["sqlite", "json"],
+        help="The backend to use to store the cache.",
+    )
+    parser.add_argument(
+        "--cache-size-limit",
+        metavar="cache_size_limit",
+        default=None,
+        help="The maximum size of the cache (eg 500M). Least recently used items will be removed.",
+    )
+    parser.add_argument(
+        "--cache-stats", action="store_true", help="Show statistics about use of the cache."
+    )
+    parser.add_argument(
+        "--import-cache",
+        metavar="import_cache",
+        default=None,
+        help="Import a cache bundle (eg bundle.tar.gz) into the cache before building.",
+    )
+    parser.add_argument(
+        "--export-cache",
+        metavar="export_cache",
+        default=None,
+        help="Export the cache to a bundle (eg bundle.tar.gz) after building.",
+    )
+    parser.add_argument(
+        "--lock-cache",
+        action="store_true",
+        help="Lock cache items so that each item is only computed by one process.",
+    )
     parser.add_argument(
         "--include-simplefem", action="store_true", help="Include simplefem on all pages."
     )
@@ -132,6 +184,18 @@ if __name__ == "__main__":
     if args.no_cache:
         settings.caching = False
 
+    if args.cache_backend is not None:
+        settings.set_cache_backend(args.cache_backend)
+
+    if args.lock_cache:
+        settings.cache_locking = True
+
+    if args.cache_size_limit is not None:
+        settings.set_cache_size_limit(parse_size(args.cache_size_limit))
+
+    if args.import_cache is not None:
+        print(f"Imported {import_cache(args.import_cache)} items into cache")
+
     if args.processes is not None:
         settings.set_processes(int(args.processes))
 
@@ -466,7 +530,9 @@ if __name__ == "__main__":
                         if e.filename in verification and codename in verification[e.filename]:
                             v = verification[e.filename][codename]
                     if v is not None:
-                        if len(v["fail"]) == 0:
+                        # Examples that timed out or ran out of memory have not been verified
+                        not_verified = v.get("timeout", []) + v.get("oom", [])
+                        if len(v["fail"]) == 0 and len(not_verified) == 0:
                             if len(v["not implemented"]) == 0:
                                 short_info += f" {green_check_small}"
                                 info += (
@@ -511,12 +577,24 @@ if __name__ == "__main__":
                                     f"document.getElementById('{jscodename}-hiddenverification')"
                                     ".style.display = 'none'\n}\n</script>"
                                 )
-                        elif len(v["pass"]) > 0:
+                        elif len(v["pass"]) > 0 or len(v["fail"]) == 0:
+                            if len(v["fail"]) > 0:
+                                summary = (
+                                    "This implementation is correct for some of the examples below."
+                                )
+                            elif len(v["pass"]) > 0:
+                                summary = (
+                                    "This implementation is correct for some of the examples "
+                                    "below, and could not be verified for the others."
+                                )
+                            else:
+                                summary = (
+                                    "This implementation could not be verified for the "
+                                    "examples below."
+                                )
                             short_info += f" {orange_check_small}"
                             info += (
-                                f"{orange_check} <span style='{text_style}'>"
-                                "This implementation is correct for some of "
-                                "the examples below.</span>"
+                                f"{orange_check} <span style='{text_style}'>{summary}</span>"
                                 f"<div style='display:block;margin-left:30px;{text_style}' "
                                 f"id='{jscodename}-showverification'>"
                                 f"<a href='javascript:show_{jscodename}_verification()'>"
@@ -525,13 +603,26 @@ if __name__ == "__main__":
                                 f"<div style='margin-left:30px;{text_style}'>"
                                 f"<a href='javascript:hide_{jscodename}_verification()'>"
                                 "&uarr; Hide &uarr;</a></div>"
-                                f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
-                                f"{green_check} "
-                                f"<b>Correct</b>: {'; '.join(v['pass'])}</div>"
-                                f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
-                                f"{red_check} "
-                                f"<b>Incorrect</b>: {'; '.join(v['fail'])}</div>"
                             )
+                            if len(v["pass"]) > 0:
+                                info += (
+                                    f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
+                                    f"{green_check} "
+                                    f"<b>Correct</b>: {'; '.join(v['pass'])}</div>"
+                                )
+                            if len(v["fail"]) > 0:
+                                info += (
+                                    f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
+                                    f"{red_check} "
+                                    f"<b>Incorrect</b>: {'; '.join(v['fail'])}</div>"
+                                )
+                            if len(not_verified) > 0:
+                                info += (
+                                    f"<div style='margin-left:70px;text-indent:-40px;{text_style}'>"
+                                    f"{orange_check} "
+                                    "<b>Not verified (timed out or ran out of memory)</b>: "
+                                    f"{'; '.join(not_verified)}</div>"
+                                )
                             if len(v["not implemented"]) > 0:
                                 short_info += f" {blue_minus_small}"
                                 info += (
@@ -657,6 +748,9 @@ if __name__ == "__main__":
                         "element_filename": e.html_filename,
                         "filename": fname,
                         "url": f"/elements/examples/{fname}",
+                        "definition_hash": content_hash(
+                            e.data, symfem_name, symfem_degree, params, eg
+                        ),
                     }
                     if "variant" in params:
                         eginfo["kwargs"]["variant"] = params["variant"]
@@ -672,9 +766,12 @@ if __name__ == "__main__":
                 content += "<table class='element-info'>"
                 for eg in element_examples:
                     element = create_element(*eg["args"], **eg["kwargs"])
+                    dof_diagram = plotting.plot_dof_diagram(
+                        element, link=False, cache_hash=plotting.plot_hash(element)
+                    )
                     content += (
                         f"<tr><td>{eg['name']}</td><td><center><a href='{eg['url']}'>"
-                        f"{plotting.plot_dof_diagram(element, link=False)}"
+                        f"{dof_diagram}"
                         "<br /><small>(click to view basis functions)</small></a></center></td></tr>"
                     )
                 content += "</table>"
@@ -727,7 +824,7 @@ if __name__ == "__main__":
             for ver in verification.values():
                 if i in ver:
                     good += len(ver[i]["pass"])
-                    total += len(ver[i]["pass"]) + len(ver[i]["fail"])
+                    total += sum(len(ver[i].get(s, [])) for s in ["pass", "fail", "timeout", "oom"])
             proportion = f"{good} / {total}"
             if good == total:
                 col = symfem.plotting.Colors.GREEN
@@ -992,9 +1089,10 @@ if __name__ == "__main__":
             row += "<td>"
             if e.filename in verification and i in verification[e.filename]:
                 result = verification[e.filename][i]
-                if len(result["pass"]) > 0 or len(result["fail"]) > 0:
+                not_verified = result.get("timeout", []) + result.get("oom", [])
+                if len(result["pass"]) > 0 or len(result["fail"]) > 0 or len(not_verified) > 0:
                     n += 1
-                    if len(result["fail"]) == 0:
+                    if len(result["fail"]) == 0 and len(not_verified) == 0:
                         row += green_check
                     elif len(result["pass"]) > 0:
                         row += orange_check
@@ -1050,6 +1148,11 @@ if __name__ == "__main__":
                         impl_rows[i].append(
                             f"<td style='font-size:80%'>{eg}</td><td>{red_check}</td>"
                         )
+                    elif eg in result.get("timeout", []) or eg in result.get("oom", []):
+                        long_row += orange_check
+                        impl_rows[i].append(
+                            f"<td style='font-size:80%'>{eg}</td><td>{orange_check}</td>"
+                        )
                     else:
                         long_row += blue_minus
                 else:
@@ -1090,7 +1193,8 @@ if __name__ == "__main__":
         f"<tr><td>{green_check}</td><td>Verification passes from all the examples on the element's page"
         "</td></tr>"
         f"<tr><td>{orange_check}</td><td>Verification passes for some examples, but not all</td></tr>"
-        f"<tr><td>{red_check}</td><td>Verification fails for all examples</td></tr>"
+        f"<tr><td>{red_check}</td><td>Verification fails or could not be completed for all examples"
+        "</td></tr>"
         "</table>"
         "<p>You can view more details of which examples pass and fail on the "
         "<a href='/verification/detailed.html'>verification with full detail page</a>.</p>"
@@ -1100,6 +1204,7 @@ if __name__ == "__main__":
         "<table style='margin:auto' class='bordered align-left'>"
         f"<tr><td>{green_check}</td><td>Verification passes</td></tr>"
         f"<tr><td>{red_check}</td><td>Verification fails</td></tr>"
+        f"<tr><td>{orange_check}</td><td>Verification timed out or ran out of memory</td></tr>"
         f"<tr><td>{blue_minus}</td><td>Example not implemented</td></tr>"
         "</table>"
         "<p>You can view a summarised version of this information on the "
@@ -1111,6 +1216,7 @@ if __name__ == "__main__":
             "<table style='margin:auto' class='bordered align-left'>"
             f"<tr><td>{green_check}</td><td>Verification passes</td></tr>"
             f"<tr><td>{red_check}</td><td>Verification fails</td></tr>"
+            f"<tr><td>{orange_check}</td><td>Verification timed out or ran out of memory</td></tr>"
             "</table>"
             "<p>You can information about verification of other libraries on the "
             "<a href='/verification/index.html'>verification page</a>.</p>"
@@ -1193,15 +1299,17 @@ if __name__ == "__main__":
     # Make example pages
     print("Making examples")
     if settings.processes == 1:
-        for e in all_examples:
-            build_example(e)
+        example_statistics = [build_example(e) for e in all_examples]
     else:
         import multiprocessing
 
         multiprocessing.set_start_method("fork")
 
         with multiprocessing.Pool(settings.processes) as p:
-            p.map(build_example, all_examples)
+            example_statistics = p.map(build_example, all_examples)
+    cache_statistics = take_statistics()
+    for stats in example_statistics:
+        cache_statistics = merge_statistics(cache_statistics, stats)
 
     # Index page
     content = heading_with_self_ref("h1", "Index of elements")
@@ -1747,5 +1855,13 @@ if __name__ == "__main__":
     with open(os.path.join(settings.html_path, "sitemap.html"), "w") as f:
         f.write(make_html_page(content))
 
+    # Tidy cache
+    cache_statistics = merge_statistics(cache_statistics, take_statistics())
+    tidy_cache()
+    if args.cache_stats:
+        print(statistics_report(cache_statistics))
+    if args.export_cache is not None:
+        print(f"Exported {export_cache(args.export_cache)} items from cache")
+
     end_all = datetime.now()
     print(f"Total time: {(end_all - start_all).total_seconds():.2f}s")
@@ -1,62 +1,1150 @@
 """Caching."""
 
+import contextlib
+import functools
+import hashlib
+import inspect
 import json
 import os
+import shutil
+import sys
+import tempfile
+import time
+import typing
 
 import symfem
+from numpy import float64
+from numpy.typing import NDArray
+from symfem.finite_element import FiniteElement
 from webtools.tools import join
 
 from defelement import settings
 
-cache_version = "1.0.0"
+cache_version = "1.2.0"
+
+# Symfem modules that every element's plots and descriptions depend on
+symfem_core_modules = [
+    "symfem.finite_element",
+    "symfem.functionals",
+    "symfem.plotting",
+    "symfem.references",
+]
+
+
+def content_hash(*items: typing.Any) -> str:
+    """Compute a stable hash of some inputs.
+
+    Args:
+        items: JSON-serialisable items (other objects will be converted to strings)
+
+    Returns:
+        Hex digest of the hash
+    """
+    data = json.dumps(items, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+@functools.cache
+def _module_source_hash(module_name: str) -> str:
+    """Compute a hash of the source of a module.
+
+    Args:
+        module_name: The name of the module
+
+    Returns:
+        Hex digest of the hash
+    """
+    module = sys.modules[module_name]
+    try:
+        filename = inspect.getsourcefile(module)
+    except TypeError:
+        filename = None
+    if filename is None:
+        return content_hash(module_name, symfem.__version__)
+    with open(filename, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@functools.cache
+def _symfem_class_source_hash(cls: type) -> str:
+    """Compute a hash of the Symfem source that a class depends on.
+
+    This includes the modules that the class and its bases are defined in and the
+    Symfem modules that these import from.
+
+    Args:
+        cls: The class
+
+    Returns:
+        Hex digest of the hash
+    """
+    modules = set(symfem_core_modules)
+    for c in cls.__mro__:
+        if c.__module__.startswith("symfem"):
+            modules.add(c.__module__)
+            for value in vars(sys.modules[c.__module__]).values():
+                m = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", "")
+                if isinstance(m, str) and m.startswith("symfem") and m in sys.modules:
+                    modules.add(m)
+    return content_hash(*[(m, _module_source_hash(m)) for m in sorted(modules)])
+
+
+def symfem_source_hash(element: FiniteElement) -> str:
+    """Compute a hash of the Symfem source that an element depends on.
+
+    Args:
+        element: Symfem element
+
+    Returns:
+        Hex digest of the hash
+    """
+    return _symfem_class_source_hash(type(element))
+
+
+@functools.cache
+def symfem_element_source_hash(name: str, reference: str) -> str:
+    """Compute a hash of the Symfem source that an element depends on without creating it.
+
+    Args:
+        name: The name of the element in Symfem
+        reference: The name of the reference cell
+
+    Returns:
+        Hex digest of the hash. This is the same as symfem_source_hash for the element if its
+        class can be found, otherwise it is a hash of all of Symfem's source
+    """
+    from symfem.create import _elementmap
+
+    if reference.startswith("dual polygon"):
+        reference = "dual polygon"
+    if name not in _elementmap and name.startswith("discontinuous "):
+        name = name[14:]
+    if reference in _elementmap.get(name, {}):
+        cls: type = _elementmap[name][reference]
+        return _symfem_class_source_hash(cls)
+    return content_hash(
+        *[(m, _module_source_hash(m)) for m in sorted(sys.modules) if m.split(".")[0] == "symfem"]
+    )
+
+
+def verification_source_hash() -> str:
+    """Compute a hash of the source of the verification algorithm.
+
+    Returns:
+        Hex digest of the hash
+    """
+    import defelement.verification  # noqa: F401
+
+    return _module_source_hash("defelement.verification")
+
+
+def element_hash(definition_hash: str, element: FiniteElement) -> str:
+    """Compute the hash used to validate cached items for an element.
+
+    Args:
+        definition_hash: Hash of the .def entry, implementation string and example
+        element: Symfem element
+
+    Returns:
+        Hex digest of the hash
+    """
+    return content_hash(definition_hash, symfem_source_hash(element))
+
+
+class CacheBackend:
+    """Storage backend for the build cache."""
+
+    def load(self, item_key: str) -> dict[str, typing.Any] | None:
+        """Load an entry.
+
+        Args:
+            item_key: The key of the item
+
+        Returns:
+            The entry, or None if there is no entry with this key
+        """
+        raise NotImplementedError()
+
+    def save(self, item_key: str, entry: dict[str, typing.Any]):
+        """Save an entry.
+
+        Args:
+            item_key: The key of the item
+            entry: The entry
+        """
+        raise NotImplementedError()
+
+    def remove(self, item_key: str):
+        """Remove an entry.
+
+        Args:
+            item_key: The key of the item
+        """
+        raise NotImplementedError()
+
+    def keys(self) -> list[str]:
+        """Get the keys of all entries.
+
+        Returns:
+            List of keys
+        """
+        raise NotImplementedError()
+
+    def touch(self, item_key: str):
+        """Record that an entry has been used.
+
+        This updates the time that the entry was last accessed and increments its hit count.
+
+        Args:
+            item_key: The key of the item
+        """
+        raise NotImplementedError()
+
+    def usage(self) -> list[tuple[str, int, float, int]]:
+        """Get information about the use of every entry.
+
+        Returns:
+            List of the key, size in bytes, last access time and number of hits of each entry
+        """
+        raise NotImplementedError()
+
+    def evict(self, max_size: int) -> int:
+        """Remove the least recently used entries until the cache fits in a size budget.
+
+        Args:
+            max_size: The maximum total size of the entries in bytes
+
+        Returns:
+            The number of entries removed
+        """
+        usage = sorted(self.usage(), key=lambda u: u[2])
+        total = sum(u[1] for u in usage)
+        removed = 0
+        for item_key, size, _, _ in usage:
+            if total <= max_size:
+                break
+            self.remove(item_key)
+            total -= size
+            removed += 1
+        return removed
+
+    def save_file(self, item_key: str, entry: dict[str, typing.Any], filename: str):
+        """Save the contents of a file as an entry.
+
+        Args:
+            item_key: The key of the item
+            entry: The entry, without its content
+            filename: The file
+        """
+        with open(filename, "rb") as f:
+            self.save(item_key, {**entry, "content": f.read()})
+
+    def read_content(self, item_key: str, entry: dict[str, typing.Any]) -> str | bytes:
+        """Read the content of an entry.
+
+        Args:
+            item_key: The key of the item
+            entry: The entry, as returned by load
+
+        Returns:
+            The content: a string for items or bytes for files
+        """
+        return entry["content"]
+
+    def restore_file(self, item_key: str, entry: dict[str, typing.Any], filename: str):
+        """Restore a file from an entry.
+
+        Args:
+            item_key: The key of the item
+            entry: The entry, as returned by load
+            filename: The file to write to
+        """
+
+        def write(tmp: str):
+            with open(tmp, "wb") as f:
+                f.write(entry["content"])
+
+        _atomic_replace(filename, write)
+
+    def invalidate(self) -> int:
+        """Remove all entries that were created with a different cache version.
+
+        Returns:
+            The number of entries removed
+        """
+        removed = 0
+        for item_key in self.keys():
+            entry = self.load(item_key)
+            if entry is not None and entry.get("cache_version") != cache_version:
+                self.remove(item_key)
+                removed += 1
+        return removed
+
+    def prefetch(self, item_hash: str):
+        """Load all entries with a given hash into memory.
+
+        Implementation of this function is optional.
+
+        Args:
+            item_hash: Hash of the inputs used to generate the items
+        """
+
+    def vacuum(self):
+        """Reclaim unused space.
+
+        Implementation of this function is optional.
+        """
+
+    def close(self):
+        """Close the backend.
+
+        Implementation of this function is optional.
+        """
+
+
+# The file mode creation mask, used to give atomically written files the default permissions
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def _atomic_replace(filename: str, write: typing.Callable[[str], typing.Any]):
+    """Create or replace a file atomically.
+
+    The file is written to a temporary file in the same folder, which is then renamed,
+    so readers will either see the old file or the complete new file.
+
+    Args:
+        filename: The file
+        write: Function that writes the content to the file whose name it is passed
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename), prefix=".tmp-")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.chmod(tmp, 0o666 & ~_umask)
+        os.replace(tmp, filename)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+
+
+class JSONDirectoryBackend(CacheBackend):
+    """Cache backend that stores one JSON file per entry.
+
+    The time that an entry was last accessed is stored as the modification time of its JSON
+    file, and its hits are counted by appending a byte to a separate file for each hit, so
+    that the entry is not rewritten every time it is used.
+    """
+
+    def __init__(self, path: str):
+        """Initialise.
+
+        Args:
+            path: The cache directory
+        """
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+
+    def load(self, item_key: str) -> dict[str, typing.Any] | None:
+        """Load an entry."""
+        try:
+            with open(join(self.path, f"{item_key}.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, item_key: str, entry: dict[str, typing.Any]):
+        """Save an entry."""
+
+        def write(filename: str):
+            with open(filename, "w") as f:
+                json.dump(entry, f)
+
+        _atomic_replace(join(self.path, f"{item_key}.json"), write)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(join(self.path, f"{item_key}.hits"))
+
+    def remove(self, item_key: str):
+        """Remove an entry."""
+        for ext in ["json", "bin", "hits"]:
+            try:
+                os.remove(join(self.path, f"{item_key}.{ext}"))
+            except FileNotFoundError:
+                pass
+
+    def keys(self) -> list[str]:
+        """Get the keys of all entries."""
+        return [file[:-5] for file in os.listdir(self.path) if file.endswith(".json")]
+
+    def touch(self, item_key: str):
+        """Record that an entry has been used."""
+        try:
+            os.utime(join(self.path, f"{item_key}.json"))
+        except FileNotFoundError:
+            return
+        with open(join(self.path, f"{item_key}.hits"), "ab") as f:
+            f.write(b"\0")
+
+    def usage(self) -> list[tuple[str, int, float, int]]:
+        """Get information about the use of every entry."""
+        out = []
+        for item_key in self.keys():
+            try:
+                last_access = os.path.getmtime(join(self.path, f"{item_key}.json"))
+            except FileNotFoundError:
+                continue
+            size = 0
+            for ext in ["json", "bin"]:
+                try:
+                    size += os.path.getsize(join(self.path, f"{item_key}.{ext}"))
+                except FileNotFoundError:
+                    pass
+            try:
+                hits = os.path.getsize(join(self.path, f"{item_key}.hits"))
+            except FileNotFoundError:
+                hits = 0
+            out.append((item_key, size, last_access, hits))
+        return out
+
+    def save_file(self, item_key: str, entry: dict[str, typing.Any], filename: str):
+        """Save the contents of a file as an entry.
+
+        The file is copied into the cache directory as it is, and the entry's metadata
+        is stored in a JSON file next to it.
+        """
+        _atomic_replace(
+            join(self.path, f"{item_key}.bin"), lambda tmp: shutil.copyfile(filename, tmp)
+        )
+        self.save(item_key, {**entry, "content": None, "file": True})
+
+    def read_content(self, item_key: str, entry: dict[str, typing.Any]) -> str | bytes:
+        """Read the content of an entry."""
+        if not entry.get("file", False):
+            return entry["content"]
+        with open(join(self.path, f"{item_key}.bin"), "rb") as f:
+            return f.read()
+
+    def restore_file(self, item_key: str, entry: dict[str, typing.Any], filename: str):
+        """Restore a file from an entry.
+
+        The file is hard linked to the copy in the cache directory if possible. As the
+        link shares its data with the cache, the restored file must not be modified in place.
+        """
+        if not entry.get("file", False):
+            super().restore_file(item_key, entry, filename)
+            return
+        blob = join(self.path, f"{item_key}.bin")
+
+        def link(tmp: str):
+            os.remove(tmp)
+            try:
+                os.link(blob, tmp)
+            except OSError:
+                shutil.copyfile(blob, tmp)
+
+        _atomic_replace(filename, link)
+
+    def vacuum(self):
+        """Remove temporary files left behind by interrupted writes."""
+        for file in os.listdir(self.path):
+            if file.startswith(".tmp-"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(join(self.path, file))
+
+
+class SQLiteBackend(CacheBackend):
+    """Cache backend that stores all entries in an SQLite database."""
+
+    def __init__(self, filename: str):
+        """Initialise.
+
+        Args:
+            filename: The database file
+        """
+        import sqlite3
+
+        folder = os.path.dirname(filename)
+        if folder != "" and not os.path.isdir(folder):
+            os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(filename, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != self.schema_version:
+            self.connection.execute("DROP TABLE IF EXISTS cache")
+            self.connection.execute(f"PRAGMA user_version = {self.schema_version}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, hash TEXT NOT NULL, cache_version TEXT NOT NULL, "
+            "symfem_version TEXT, content, size INTEGER NOT NULL, created REAL NOT NULL, "
+            "last_access REAL NOT NULL, hits INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS cache_hash ON cache (hash)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS cache_cache_version ON cache (cache_version)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)"
+        )
+        self.prefetched: dict[str, dict[str, typing.Any]] = {}
+
+    def _entry(self, row: tuple[typing.Any, ...]) -> dict[str, typing.Any]:
+        """Convert a row of the database to an entry.
+
+        Args:
+            row: The row (excluding the key)
+
+        Returns:
+            The entry
+        """
+        return dict(zip(self.columns, row))
+
+    def load(self, item_key: str) -> dict[str, typing.Any] | None:
+        """Load an entry."""
+        if item_key in self.prefetched:
+            return self.prefetched[item_key]
+        row = self.connection.execute(
+            f"SELECT {', '.join(self.columns)} FROM cache WHERE key = ?", (item_key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._entry(row)
+
+    def save(self, item_key: str, entry: dict[str, typing.Any]):
+        """Save an entry."""
+        self.prefetched.pop(item_key, None)
+        content = entry["content"]
+        entry = {
+            "created": time.time(),
+            "last_access": time.time(),
+            "hits": 0,
+            **entry,
+            "size": len(content.encode("utf-8") if isinstance(content, str) else content),
+        }
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO cache (key, {', '.join(self.columns)}) "
+            f"VALUES (?{', ?' * len(self.columns)})",
+            (item_key, *[entry[c] for c in self.columns]),
+        )
+
+    def remove(self, item_key: str):
+        """Remove an entry."""
+        self.prefetched.pop(item_key, None)
+        self.connection.execute("DELETE FROM cache WHERE key = ?", (item_key,))
+
+    def keys(self) -> list[str]:
+        """Get the keys of all entries."""
+        return [row[0] for row in self.connection.execute("SELECT key FROM cache")]
+
+    def touch(self, item_key: str):
+        """Record that an entry has been used."""
+        self.connection.execute(
+            "UPDATE cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+            (time.time(), item_key),
+        )
+
+    def usage(self) -> list[tuple[str, int, float, int]]:
+        """Get information about the use of every entry."""
+        return list(self.connection.execute("SELECT key, size, last_access, hits FROM cache"))
+
+    def invalidate(self) -> int:
+        """Remove all entries that were created with a different cache version."""
+        self.prefetched = {}
+        return self.connection.execute(
+            "DELETE FROM cache WHERE cache_version != ?", (cache_version,)
+        ).rowcount
+
+    def prefetch(self, item_hash: str):
+        """Load all entries with a given hash into memory."""
+        self.prefetched = {
+            row[0]: self._entry(row[1:])
+            for row in self.connection.execute(
+                f"SELECT key, {', '.join(self.columns)} FROM cache WHERE hash = ?",
+                (item_hash,),
+            )
+        }
+
+    def vacuum(self):
+        """Reclaim unused space.
+
+        As VACUUM rewrites the whole database, it is only run if at least vacuum_threshold
+        of the pages in the database are unused.
+        """
+        pages = self.connection.execute("PRAGMA page_count").fetchone()[0]
+        free = self.connection.execute("PRAGMA freelist_count").fetchone()[0]
+        if pages > 0 and free >= self.vacuum_threshold * pages:
+            self.connection.execute("VACUUM")
+
+    def close(self):
+        """Close the backend."""
+        self.connection.close()
+
+    schema_version = 1
+    vacuum_threshold = 0.25
+    columns = [
+        "hash",
+        "cache_version",
+        "symfem_version",
+        "content",
+        "size",
+        "created",
+        "last_access",
+        "hits",
+    ]
+
+
+backends: dict[str, typing.Callable[[str], CacheBackend]] = {
+    "json": JSONDirectoryBackend,
+    "sqlite": lambda path: SQLiteBackend(join(path, "cache.sqlite")),
+}
+
+_backend: tuple[tuple[str, str, int], CacheBackend] | None = None
+
+
+def get_backend() -> CacheBackend:
+    """Get the cache backend for this process.
+
+    A new backend is created if the cache settings have changed or if this process
+    was forked from the process that created the previous backend.
+
+    Returns:
+        The cache backend
+    """
+    global _backend
+    info = (settings.cache_backend, settings.cache_path, os.getpid())
+    if _backend is None or _backend[0] != info:
+        _backend = (info, backends[settings.cache_backend](settings.cache_path))
+    return _backend[1]
+
+
+def _new_entry(item_hash: str) -> dict[str, typing.Any]:
+    """Create the metadata for a new cache entry.
+
+    Args:
+        item_hash: Hash of the inputs used to generate the item
+
+    Returns:
+        The entry, without its content
+    """
+    now = time.time()
+    return {
+        "hash": item_hash,
+        "symfem_version": symfem.__version__,
+        "cache_version": cache_version,
+        "created": now,
+        "last_access": now,
+        "hits": 0,
+    }
+
+
+def _is_valid(entry: dict[str, typing.Any] | None, item_hash: str) -> bool:
+    """Check if a cache entry is valid.
+
+    Args:
+        entry: The entry
+        item_hash: Hash of the inputs used to generate the item
+
+    Returns:
+        True if the entry exists and is valid, otherwise False
+    """
+    if entry is None:
+        return False
+    return entry.get("hash") == item_hash and entry.get("cache_version") == cache_version
+
+
+def statistics_category(item_key: str) -> str:
+    """Get the category of a cache key used when reporting statistics.
+
+    Args:
+        item_key: The key of the item
+
+    Returns:
+        The category
+    """
+    if item_key.startswith("plot-"):
+        return "plot"
+    if item_key.startswith("markup_example-"):
+        return "markup_example"
+    if item_key.endswith("-implementation-code"):
+        return "implementation-code"
+    if item_key.startswith("symfem-basis-"):
+        return "symfem-basis"
+    return "other"
+
+
+# Number of cache hits and misses in this process for each category of key
+statistics: dict[str, tuple[int, int]] = {}
+
+
+def _record_lookup(item_key: str, hit: bool):
+    """Record a cache lookup in the statistics.
+
+    Args:
+        item_key: The key of the item
+        hit: Was a valid item found?
+    """
+    c = statistics_category(item_key)
+    hits, misses = statistics.get(c, (0, 0))
+    statistics[c] = (hits + 1, misses) if hit else (hits, misses + 1)
+
+
+def take_statistics() -> dict[str, tuple[int, int]]:
+    """Get the cache statistics for this process and reset them.
+
+    Returns:
+        The number of hits and misses for each category of key
+    """
+    global statistics
+    out = statistics
+    statistics = {}
+    return out
+
+
+def merge_statistics(
+    a: dict[str, tuple[int, int]], b: dict[str, tuple[int, int]]
+) -> dict[str, tuple[int, int]]:
+    """Combine two sets of cache statistics.
+
+    Args:
+        a: First set of statistics
+        b: Second set of statistics
+
+    Returns:
+        Combined statistics
+    """
+    out = dict(a)
+    for c, (hits, misses) in b.items():
+        h, m = out.get(c, (0, 0))
+        out[c] = (h + hits, m + misses)
+    return out
+
+
+def statistics_report(lookups: dict[str, tuple[int, int]]) -> str:
+    """Make a report of the cache statistics.
+
+    Args:
+        lookups: The number of hits and misses for each category of key
+
+    Returns:
+        The report
+    """
+    stored: dict[str, tuple[int, int, int]] = {}
+    if settings.caching:
+        for item_key, size, _, hits in get_backend().usage():
+            c = statistics_category(item_key)
+            n, b, h = stored.get(c, (0, 0, 0))
+            stored[c] = (n + 1, b + size, h + hits)
+
+    out = f"{'':20}{'hits':>8}{'misses':>8}{'hit rate':>10}{'entries':>9}{'size':>12}"
+    out += f"{'total hits':>12}\n"
+    for c in sorted(set(lookups) | set(stored)):
+        hits, misses = lookups.get(c, (0, 0))
+        rate = f"{100 * hits / (hits + misses):.1f}%" if hits + misses > 0 else "-"
+        n, b, h = stored.get(c, (0, 0, 0))
+        out += f"{c:20}{hits:>8}{misses:>8}{rate:>10}{n:>9}{b:>12}{h:>12}\n"
+    return out
+
+
+def parse_size(size: str) -> int:
+    """Parse a size in bytes.
+
+    Args:
+        size: The size, optionally followed by K, M or G
+
+    Returns:
+        The size in bytes
+    """
+    size = size.strip().upper().rstrip("B")
+    for n, unit in enumerate("KMG"):
+        if size.endswith(unit):
+            return int(float(size[:-1]) * 1024 ** (n + 1))
+    return int(size)
+
+
+@contextlib.contextmanager
+def cache_lock(item_key: str) -> typing.Iterator[None]:
+    """Hold a lock on a cache key.
+
+    If cache locking is enabled, this can be used to make sure that only one process
+    computes an item: other processes that want the same item will wait until the lock
+    is released, then find the item in the cache.
+
+    Args:
+        item_key: The key of the item
+    """
+    if not settings.caching or not settings.cache_locking:
+        yield
+        return
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    lock_path = join(settings.cache_path, "locks")
+    os.makedirs(lock_path, exist_ok=True)
+    with open(join(lock_path, f"{item_key}.lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
 
 
 def load_cache(
     item_key: str,
-    last_updated: str,
+    item_hash: str,
 ) -> str | None:
-    """Load item from cache."""
+    """Load item from cache.
+
+    Args:
+        item_key: The key of the item
+        item_hash: Hash of the inputs used to generate the item
+
+    Returns:
+        The cached item, or None if there is no valid cached item
+    """
+    if not settings.caching:
+        return None
+    backend = get_backend()
+    data = backend.load(item_key)
+    if not _is_valid(data, item_hash):
+        _record_lookup(item_key, False)
+        return None
+    assert data is not None
+    _record_lookup(item_key, True)
+    backend.touch(item_key)
+    return data.get("content")
+
+
+def save_cache(item_key: str, item_hash: str, item: str):
+    """Save item to cache.
+
+    Args:
+        item_key: The key of the item
+        item_hash: Hash of the inputs used to generate the item
+        item: The item
+    """
+    if not settings.caching:
+        return
+    get_backend().save(item_key, {**_new_entry(item_hash), "content": item})
+
+
+def load_cache_file(item_key: str, item_hash: str, filename: str) -> bool:
+    """Restore a file from the cache.
+
+    Args:
+        item_key: The key of the item
+        item_hash: Hash of the inputs used to generate the file
+        filename: The file to write to
+
+    Returns:
+        True if the file was restored, False if there is no valid cached file
+    """
+    if not settings.caching:
+        return False
+    backend = get_backend()
+    data = backend.load(item_key)
+    if not _is_valid(data, item_hash):
+        _record_lookup(item_key, False)
+        return False
+    assert data is not None
+    _record_lookup(item_key, True)
+    backend.restore_file(item_key, data, filename)
+    backend.touch(item_key)
+    return True
+
+
+def save_cache_file(item_key: str, item_hash: str, filename: str):
+    """Save a file to the cache.
+
+    The file is stored as raw binary data.
+
+    Args:
+        item_key: The key of the item
+        item_hash: Hash of the inputs used to generate the file
+        filename: The file
+    """
+    if not settings.caching:
+        return
+    get_backend().save_file(item_key, _new_entry(item_hash), filename)
+
+
+def array_hash(array: NDArray[float64]) -> str:
+    """Compute a hash of the data in a Numpy array.
+
+    Args:
+        array: The array
+
+    Returns:
+        Hex digest of the hash
+    """
+    h = hashlib.sha256(str((array.shape, array.dtype.str)).encode("utf-8"))
+    h.update(array.tobytes())
+    return h.hexdigest()
+
+
+def load_array(array_key: str) -> NDArray[float64] | None:
+    """Load a Numpy array from the array cache.
+
+    The array is memory-mapped and read-only.
+
+    Args:
+        array_key: The key of the array
+
+    Returns:
+        The array, or None if it is not in the cache
+    """
+    import numpy as np
+
     if not settings.caching:
         return None
     try:
-        with open(join(settings.cache_path, f"{item_key}.json")) as f:
-            data = json.load(f)
-        if data.get("symfem_version") != symfem.__version__:
-            return None
-        if data.get("last_updated") != last_updated:
-            return None
-        if data.get("cache_version") != cache_version:
-            return None
-        return data.get("content")
-    except FileNotFoundError:
+        return np.load(join(settings.array_cache_path, f"{array_key}.npy"), mmap_mode="r")
+    except (FileNotFoundError, ValueError, OSError):
         return None
 
 
-def save_cache(item_key: str, last_updated: str, item: str):
-    """Save item to cache."""
+def save_array(array_key: str, array: NDArray[float64]):
+    """Save a Numpy array to the array cache.
+
+    Args:
+        array_key: The key of the array
+        array: The array
+    """
+    import numpy as np
+
     if not settings.caching:
         return
-    if not os.path.isdir(settings.cache_path):
-        os.mkdir(settings.cache_path)
-    data = {
-        "content": item,
-        "symfem_version": symfem.__version__,
-        "last_updated": last_updated,
+    os.makedirs(settings.array_cache_path, exist_ok=True)
+
+    def write(filename: str):
+        with open(filename, "wb") as f:
+            np.save(f, array)
+
+    _atomic_replace(join(settings.array_cache_path, f"{array_key}.npy"), write)
+
+
+def tidy_array_cache(prefixes: list[str]):
+    """Remove arrays from the array cache whose keys do not start with any of the given prefixes.
+
+    Args:
+        prefixes: Prefixes of the keys of arrays to keep
+    """
+    if not settings.caching or not os.path.isdir(settings.array_cache_path):
+        return
+    for file in os.listdir(settings.array_cache_path):
+        if not any(file.startswith(p) for p in prefixes):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(join(settings.array_cache_path, file))
+
+
+def prefetch_cache(item_hash: str):
+    """Load all items with a given hash into memory.
+
+    Args:
+        item_hash: Hash of the inputs used to generate the items
+    """
+    if not settings.caching:
+        return
+    get_backend().prefetch(item_hash)
+
+
+def _tar_mode(filename: str) -> str:
+    """Get the compression mode to use for a cache bundle.
+
+    Args:
+        filename: The filename of the bundle
+
+    Returns:
+        The compression part of the tarfile mode
+    """
+    for ext, mode in [
+        (".tar", ""),
+        (".tar.gz", "gz"),
+        (".tgz", "gz"),
+        (".tar.bz2", "bz2"),
+        (".tar.xz", "xz"),
+        (".tar.zst", "zst"),
+    ]:
+        if filename.endswith(ext):
+            if mode == "zst" and sys.version_info < (3, 14):
+                raise ValueError("Python 3.14 or later is needed for Zstandard compression.")
+            return mode
+    raise ValueError(f"Unsupported cache bundle format: {filename}")
+
+
+# Prefixes of the keys of entries that contain code that is run when the entry is used. These
+# are never exported to or imported from bundles, as importing a bundle would otherwise allow
+# it to run arbitrary code
+unshared_prefixes = ["symfem-basis-"]
+
+
+def _is_shared(item_key: str) -> bool:
+    """Check if an entry can be exported to and imported from bundles.
+
+    Args:
+        item_key: The key of the item
+
+    Returns:
+        True if the entry can be shared, otherwise False
+    """
+    return not any(item_key.startswith(p) for p in unshared_prefixes)
+
+
+def export_cache(filename: str) -> int:
+    """Export the cache to a bundle.
+
+    Only entries that are valid for the current versions of Symfem and the cache are
+    exported, and entries containing code (see unshared_prefixes) are not exported. The
+    bundle is a (compressed) tar archive containing the content of each entry and a manifest
+    with the metadata and SHA256 checksum of each entry.
+
+    Args:
+        filename: The filename of the bundle. The compression used is determined by the
+            extension: .tar, .tar.gz, .tar.bz2, .tar.xz and (for Python 3.14+) .tar.zst
+            are supported.
+
+    Returns:
+        The number of entries exported
+    """
+    import io
+    import tarfile
+
+    mode = _tar_mode(filename)
+    backend = get_backend()
+    manifest: dict[str, typing.Any] = {
         "cache_version": cache_version,
+        "symfem_version": symfem.__version__,
+        "entries": {},
     }
-    with open(join(settings.cache_path, f"{item_key}.json"), "w") as f:
-        return json.dump(data, f)
+    with tarfile.open(filename, f"w:{mode}") as tar:  # type: ignore
+        for n, item_key in enumerate(sorted(backend.keys())):
+            if not _is_shared(item_key):
+                continue
+            entry = backend.load(item_key)
+            if (
+                entry is None
+                or entry.get("cache_version") != cache_version
+                or entry.get("symfem_version") != symfem.__version__
+            ):
+                continue
+            content = backend.read_content(item_key, entry)
+            is_file = isinstance(content, bytes)
+            data = content if isinstance(content, bytes) else content.encode("utf-8")
+            info = tarfile.TarInfo(f"entries/{n}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+            manifest["entries"][item_key] = {
+                "member": info.name,
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "file": is_file,
+                **{
+                    i: entry[i]
+                    for i in ["hash", "cache_version", "symfem_version", "created"]
+                    if i in entry
+                },
+            }
+        data = json.dumps(manifest).encode("utf-8")
+        info = tarfile.TarInfo("manifest.json")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return len(manifest["entries"])
+
+
+def import_cache(filename: str) -> int:
+    """Import entries from a bundle into the cache.
+
+    The checksums of all the entries in the bundle are checked before anything is
+    imported. Entries in the bundle are not imported if the cache already contains a
+    valid entry with the same key that was created at the same time or later. Entries
+    containing code (see unshared_prefixes) are never imported.
+
+    Args:
+        filename: The filename of the bundle
+
+    Returns:
+        The number of entries imported
+    """
+    import tarfile
+
+    mode = _tar_mode(filename)
+    with tarfile.open(filename, f"r:{mode}") as tar:  # type: ignore
+        manifest_file = tar.extractfile("manifest.json")
+        assert manifest_file is not None
+        manifest = json.load(manifest_file)
+    if manifest["cache_version"] != cache_version:
+        return 0
+    keys = {
+        info["member"]: item_key
+        for item_key, info in manifest["entries"].items()
+        if _is_shared(item_key)
+    }
+
+    # Check the checksums of every entry before importing anything
+    with tarfile.open(filename, f"r:{mode}") as tar:  # type: ignore
+        checked = set()
+        for member in tar:
+            if member.name in keys:
+                item_key = keys[member.name]
+                f = tar.extractfile(member)
+                assert f is not None
+                if hashlib.sha256(f.read()).hexdigest() != manifest["entries"][item_key]["sha256"]:
+                    raise ValueError(f"Checksum of cache entry does not match: {item_key}")
+                checked.add(item_key)
+    if len(checked) != len(keys):
+        raise ValueError("Cache bundle is missing entries.")
+
+    backend = get_backend()
+    os.makedirs(settings.cache_path, exist_ok=True)
+    imported = 0
+    with tarfile.open(filename, f"r:{mode}") as tar:  # type: ignore
+        for member in tar:
+            if member.name not in keys:
+                continue
+            item_key = keys[member.name]
+            info = manifest["entries"][item_key]
+            existing = backend.load(item_key)
+            if (
+                existing is not None
+                and existing.get("cache_version") == cache_version
+                and existing.get("created", 0.0) >= info.get("created", 0.0)
+            ):
+                continue
+            entry = {
+                **_new_entry(info["hash"]),
+                **{i: info[i] for i in ["symfem_version", "created"] if i in info},
+            }
+            f = tar.extractfile(member)
+            assert f is not None
+            if info["file"]:
+                fd, tmp = tempfile.mkstemp(dir=settings.cache_path, prefix=".tmp-")
+                with os.fdopen(fd, "wb") as out:
+                    shutil.copyfileobj(f, out)
+                try:
+                    backend.save_file(item_key, entry, tmp)
+                finally:
+                    os.remove(tmp)
+            else:
+                backend.save(item_key, {**entry, "content": f.read().decode("utf-8")})
+            imported += 1
+    return imported
 
 
 def tidy_cache():
-    """Remove old items from cache."""
+    """Remove old items from cache.
+
+    This should not be run while other processes are using the cache.
+
+    Entries created with a different cache version are removed. If a cache size limit
+    is set, the least recently used entries are then removed until the cache fits within
+    the limit.
+    """
     if not settings.caching or not os.path.isdir(settings.cache_path):
         return
-    for file in os.listdir(settings.cache_path):
-        with open(join(settings.cache_path, file)) as f:
-            data = json.load(f)
-        if (
-            data.get("symfem_version") != symfem.__version__
-            or data.get("cache_version") != cache_version
-        ):
-            os.remove(join(settings.cache_path, file))
+    shutil.rmtree(join(settings.cache_path, "locks"), ignore_errors=True)
+    backend = get_backend()
+    backend.invalidate()
+    if settings.cache_size_limit is not None:
+        backend.evict(settings.cache_size_limit)
+    backend.vacuum()
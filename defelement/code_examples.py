@@ -1,13 +1,33 @@
 """Generating code snippets."""
 
-import symfem
-from defelement.caching import load_cache, save_cache
+from defelement.caching import content_hash, load_cache, save_cache, symfem_source_hash
 from defelement.element import Element
 from defelement.implementations import Implementation
+from defelement.implementations.symfem import symfem_create_element
 from defelement.tools import jsify
 from defelement.languages import languages
 
 
+def implementation_code_hash(e: Element, impl: type[Implementation], language: str) -> str:
+    """Compute the hash of the inputs used to generate implementation code with Symfem.
+
+    Args:
+        e: The element
+        impl: The implementation
+        language: Programming language
+
+    Returns:
+        Hex digest of the hash
+    """
+    sources: list[str | None] = []
+    for eg in e.examples:
+        try:
+            sources.append(symfem_source_hash(symfem_create_element(e, eg)))
+        except (NotImplementedError, KeyError, ValueError):
+            sources.append(None)
+    return content_hash(e.data, impl.id, language, sources)
+
+
 def generate_examples(e: Element, impl: type[Implementation], language: str) -> str | None:
     """Generate code snippets.
 
@@ -28,7 +48,8 @@ def generate_examples(e: Element, impl: type[Implementation], language: str) ->
     # Implementations generated from other implementations (eg Basix code generated by Symfem)
     if impl.id.startswith("*(") and impl.id.endswith(")"):
         cache_id = f"{e.name}-{impl.id}-implementation-code"
-        c = load_cache(cache_id, symfem.__version__)
+        code_hash = implementation_code_hash(e, impl, language)
+        c = load_cache(cache_id, code_hash)
         input_code, output_code = impl.id[2:-1].split(" -> ")
         jscodename = jsify(output_code)
         if c is None:
@@ -36,9 +57,9 @@ def generate_examples(e: Element, impl: type[Implementation], language: str) ->
                 return None
             try:
                 example_code = e.make_implementation_examples(impl.id, language)
-                save_cache(cache_id, symfem.__version__, example_code)
+                save_cache(cache_id, code_hash, example_code)
             except (NotImplementedError, KeyError):
-                save_cache(cache_id, symfem.__version__, "_NONE")
+                save_cache(cache_id, code_hash, "_NONE")
                 return None
         elif c == "_NONE":
             return None
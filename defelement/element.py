@@ -627,6 +627,48 @@ class Element:
             return ""
         return make_dof_data(self.data["ndofs"])
 
+    def dof_count(self, reference: str, degree: int) -> int | None:
+        """Get the number of DOFs of the element.
+
+        Args:
+            reference: The reference cell
+            degree: The degree
+
+        Returns:
+            The number of DOFs, or None if it cannot be computed from the formula in the .def file
+        """
+        from sympy.parsing.sympy_parser import (
+            convert_xor,
+            implicit_multiplication,
+            parse_expr,
+            standard_transformations,
+        )
+
+        data = self.data.get("ndofs", {})
+        if not isinstance(data, dict) or "formula" not in data.get(reference, {}):
+            return None
+        formula = data[reference]["formula"]
+        if isinstance(formula, list):
+            cases = [(c.replace(" ", ""), f) for case in formula for c, f in case.items()]
+            for condition, f in cases:
+                if (
+                    condition.startswith("k=")
+                    and str(degree) in condition[2:].split(",")
+                    or condition.startswith("k>")
+                    and degree > int(condition[2:])
+                ):
+                    formula = f
+                    break
+            else:
+                return None
+        n = parse_expr(
+            str(formula),
+            transformations=standard_transformations + (implicit_multiplication, convert_xor),
+        ).subs(sympy.Symbol("k"), degree)
+        if not n.is_Integer:
+            return None
+        return int(n)
+
     def entity_dof_counts(self) -> str:
         """Get entity DOF counts.
 
@@ -12,7 +12,7 @@ from webtools.html import make_html_forwarding_page, make_html_page
 from webtools.markup import heading_with_self_ref
 
 from defelement import plotting, settings, symbols
-from defelement.caching import load_cache, save_cache
+from defelement.caching import cache_lock, load_cache, save_cache
 
 defelement_t = ["s_{0}", "s_{1}", "s_{2}"]
 
@@ -107,12 +107,66 @@ def describe_dof(element: FiniteElement, d: BaseFunctional) -> tuple[str, list[s
     return desc, symb
 
 
+def describe_basis(element: FiniteElement, plots: list[str | None]) -> str:
+    """Describe the basis functions of an element.
+
+    Args:
+        element: The element
+        plots: HTML for plots of the basis functions
+
+    Returns:
+        Description as HTML
+    """
+    basis = ""
+    for dof_i, func in enumerate(element.get_basis_functions()):
+        basis += "<div class='basisf'><div style='display:inline-block'>"
+        pd = plots[dof_i]
+        if pd is not None:
+            basis += pd
+        basis += "</div>"
+        basis += "<div style='display:inline-block;padding-left:10px;padding-bottom:10px'>"
+        if isinstance(element, CiarletElement) and len(element.dofs) > 0:
+            dof = element.dofs[dof_i]
+            basis += f"\\(\\displaystyle {symbols.functional}_{{{dof_i}}}:"
+            dof_tex, symbols_used = describe_dof(element, dof)
+            basis += dof_tex + "\\)"
+            if len(symbols_used) > 0:
+                basis += "<br />where " + ";<br />".join(symbols_used[:-1])
+                if len(symbols_used) > 1:
+                    basis += ";<br />and "
+                basis += symbols_used[-1] + "."
+            basis += "<br /><br />"
+        if element.range_dim == 1:
+            basis += f"\\(\\displaystyle {symbols.basis_function}_{{{dof_i}}} = "
+        elif element.range_shape is None or len(element.range_shape) == 1:
+            basis += f"\\(\\displaystyle {symbols.vector_basis_function}_{{{dof_i}}} = "
+        else:
+            basis += f"\\(\\displaystyle {symbols.matrix_basis_function}_{{{dof_i}}} = "
+        basis += to_tex(func) + "\\)"
+        if isinstance(element, CiarletElement):
+            if len(element.dofs) > 0:
+                basis += "<br /><br />"
+                basis += "This DOF is associated with "
+                basis += entity_name(dof.entity[0]) + f" {dof.entity[1]}"
+                basis += " of the reference cell."
+        elif isinstance(element, DirectElement):
+            basis += "<br /><br />"
+            basis += "This DOF is associated with "
+            basis += entity_name(element._basis_entities[dof_i][0])
+            basis += f" {element._basis_entities[dof_i][1]}"
+            basis += " of the reference cell."
+        basis += "</div>"
+        basis += "</div>"
+    return basis
+
+
 def markup_example(
     element: FiniteElement,
     html_name: str,
     element_page: str,
     fname: str,
     legacy_filenames: list[str] = [],
+    cache_hash: str | None = None,
 ) -> str:
     """Markup examples.
 
@@ -122,6 +176,7 @@ def markup_example(
         element_page: URL of elemtn page
         fname: Filename
         legacy_filenames: Old filenames to create redirects from
+        cache_hash: Hash of the inputs to the example, or None if the example should not be cached
 
     Returns:
         Example as HTML
@@ -132,7 +187,9 @@ def markup_example(
     eg += "\n"
     eg += f"<a href='{element_page}'><small>&#9664; Back to {html_name} definition page"
     eg += "</a></small>\n"
-    eg += "<center>" + plotting.plot_dof_diagram(element) + "</center>\n"
+    # Plots are cached using the same hash on every page that they are used on
+    plot_hash = None if cache_hash is None else plotting.plot_hash(element)
+    eg += "<center>" + plotting.plot_dof_diagram(element, cache_hash=plot_hash) + "</center>\n"
     eg += "In this example:\n<ul>\n"
     # Reference
     eg += f"<li>\\({symbols.reference}\\) is the reference {element.reference.name}."
@@ -155,55 +212,21 @@ def markup_example(
         eg += "<li>Functionals and basis functions:</li>"
     eg += "</ul>"
 
-    plots = plotting.plot_basis_functions(element)
+    plots = plotting.plot_basis_functions(element, cache_hash=plot_hash)
 
     cache_key = f"markup_example-{html_name}-{element.order}-{element.reference.name}"
     for i, j in element.init_kwargs().items():
         cache_key += f"-{i}-{j}"
-    basis = load_cache(cache_key, element.last_updated)
-
-    if basis is None:
-        basis = ""
-        for dof_i, func in enumerate(element.get_basis_functions()):
-            basis += "<div class='basisf'><div style='display:inline-block'>"
-            pd = plots[dof_i]
-            if pd is not None:
-                basis += pd
-            basis += "</div>"
-            basis += "<div style='display:inline-block;padding-left:10px;padding-bottom:10px'>"
-            if isinstance(element, CiarletElement) and len(element.dofs) > 0:
-                dof = element.dofs[dof_i]
-                basis += f"\\(\\displaystyle {symbols.functional}_{{{dof_i}}}:"
-                dof_tex, symbols_used = describe_dof(element, dof)
-                basis += dof_tex + "\\)"
-                if len(symbols_used) > 0:
-                    basis += "<br />where " + ";<br />".join(symbols_used[:-1])
-                    if len(symbols_used) > 1:
-                        basis += ";<br />and "
-                    basis += symbols_used[-1] + "."
-                basis += "<br /><br />"
-            if element.range_dim == 1:
-                basis += f"\\(\\displaystyle {symbols.basis_function}_{{{dof_i}}} = "
-            elif element.range_shape is None or len(element.range_shape) == 1:
-                basis += f"\\(\\displaystyle {symbols.vector_basis_function}_{{{dof_i}}} = "
+    if cache_hash is None:
+        basis = describe_basis(element, plots)
+    else:
+        with cache_lock(cache_key):
+            cached_basis = load_cache(cache_key, cache_hash)
+            if cached_basis is None:
+                basis = describe_basis(element, plots)
+                save_cache(cache_key, cache_hash, basis)
             else:
-                basis += f"\\(\\displaystyle {symbols.matrix_basis_function}_{{{dof_i}}} = "
-            basis += to_tex(func) + "\\)"
-            if isinstance(element, CiarletElement):
-                if len(element.dofs) > 0:
-                    basis += "<br /><br />"
-                    basis += "This DOF is associated with "
-                    basis += entity_name(dof.entity[0]) + f" {dof.entity[1]}"
-                    basis += " of the reference cell."
-            elif isinstance(element, DirectElement):
-                basis += "<br /><br />"
-                basis += "This DOF is associated with "
-                basis += entity_name(element._basis_entities[dof_i][0])
-                basis += f" {element._basis_entities[dof_i][1]}"
-                basis += " of the reference cell."
-            basis += "</div>"
-            basis += "</div>"
-        save_cache(cache_key, element.last_updated, basis)
+                basis = cached_basis
 
     eg += basis
 
@@ -39,3 +39,6 @@ formats = {id: i.format for id, i in implementations.items()}
 examples = {id: i.examples for id, i in implementations.items()}
 versions = {id: i.version for id, i in implementations.items()}
 verifications = {id: i.verify for id, i in implementations.items() if i.verification}
+verification_preparations = {
+    id: i.prepare_verification for id, i in implementations.items() if i.verification
+}
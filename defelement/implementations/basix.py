@@ -119,4 +119,5 @@ class BasixImplementation(Implementation):
     name = "Basix"
     url = "https://github.com/FEniCS/basix"
     verification = True
+    verification_modules = ["basix"]
     languages = ["python"]
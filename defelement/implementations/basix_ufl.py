@@ -130,6 +130,7 @@ class BasixUFLImplementation(Implementation):
     name = "Basix.UFL"
     url = "https://github.com/FEniCS/basix"
     verification = True
+    verification_modules = ["basix", "basix.ufl"]
     languages = ["python"]
 
 
@@ -295,3 +296,4 @@ class CustomBasixUFLImplementation(BasixUFLImplementation):
         return True
 
     id = "*(symfem -> basix.ufl)"
+    verification_modules = ["basix.ufl", "symfem", "symfem.basix_interface"]
@@ -1,5 +1,6 @@
 """Implementation template class and other functions."""
 
+import importlib
 import re
 import typing
 
@@ -181,6 +182,19 @@ class Implementation:
         """
         raise NotImplementedError()
 
+    @classmethod
+    def prepare_verification(cls):
+        """Prepare to run verification.
+
+        This function is called once before verification starts, so that (when verifying in
+        parallel) modules are imported before the worker processes are created rather than in
+        every worker. By default, this imports the modules listed in `verification_modules`.
+
+        Raises ImportError if the implementation is not installed.
+        """
+        for module in cls.verification_modules:
+            importlib.import_module(module)
+
     @classmethod
     def implemented(cls, element: Element) -> bool:
         """Check if an element is implemented.
@@ -288,6 +302,8 @@ class Implementation:
     url: str
     # Set to true if this implementation should be verified
     verification = False
+    # Modules imported by the verify function
+    verification_modules: typing.List[str] = []
     # Language(s) that this implementation can create snippets for
     languages: typing.List[str]
     # Language to pass into install command to get command(s) to install
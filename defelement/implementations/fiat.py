@@ -236,4 +236,5 @@ class FIATImplementation(Implementation):
     name = "FIAT"
     url = "https://github.com/firedrakeproject/fiat"
     verification = True
+    verification_modules = ["FIAT"]
     languages = ["python"]
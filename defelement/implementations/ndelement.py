@@ -165,5 +165,6 @@ class NdelementImplementation(Implementation):
     name = "ndelement"
     url = "https://codeberg.org/nd-project/nd"
     verification = True
+    verification_modules = ["ndelement.ciarlet", "ndelement.reference_cell"]
     languages = ["python", "rust"]
     install_language = "python"
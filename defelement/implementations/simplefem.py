@@ -134,6 +134,7 @@ class SimplefemImplementation(Implementation):
     # </variables>
     # <verificationvariable>
     verification = True
+    verification_modules = ["simplefem"]
 
 
 # </verificationvariable>
@@ -1,11 +1,23 @@
 """Symfem implementation."""
 
+import functools
+import inspect
 import typing
+from collections import OrderedDict
 
 from symfem.finite_element import FiniteElement
 from numpy import float64
 from numpy.typing import NDArray
 
+from defelement.caching import (
+    array_hash,
+    content_hash,
+    load_array,
+    load_cache,
+    save_array,
+    save_cache,
+    symfem_source_hash,
+)
 from defelement.element import Element
 from defelement.implementations.core import (
     Implementation,
@@ -38,17 +50,193 @@ def symfem_create_element(element: Element, example: str) -> FiniteElement:
     return symfem.create_element(ref, symfem_name, deg, **params)
 
 
+@functools.lru_cache(maxsize=4)
+def _create_element(
+    reference: str, name: str, degree: int, params: tuple[tuple[str, typing.Any], ...]
+) -> FiniteElement:
+    """Create a Symfem element for verification.
+
+    The most recently created elements are kept, so that the same element can be used
+    by verify and verification_degree without being created twice.
+
+    Args:
+        reference: The name of the reference cell
+        name: The name of the element in Symfem
+        degree: The degree of the element in Symfem
+        params: Additional parameters
+
+    Returns:
+        Symfem element
+    """
+    import symfem
+
+    if reference == "dual polygon":
+        reference += "(4)"
+    return symfem.create_element(reference, name, degree, **dict(params))  # type: ignore
+
+
+def verification_degree(
+    name: str, reference: str, degree: int, params: dict[str, str]
+) -> int | None:
+    """Get the degree of the Lagrange space that a Symfem element is contained in.
+
+    Args:
+        name: The name of the element in Symfem
+        reference: The name of the reference cell
+        degree: The degree of the element in Symfem
+        params: Additional parameters
+
+    Returns:
+        The degree, or None if the element is not contained in a polynomial Lagrange space
+        (eg if it is piecewise or rational)
+    """
+    e = _create_element(reference, name, degree, tuple(sorted(params.items())))
+    try:
+        if e.polynomial_superdegree is None:
+            return None
+        return e.lagrange_superdegree
+    except NotImplementedError:
+        return None
+
+
+def array_key_prefix() -> str:
+    """Get the prefix of keys of Symfem tables in the array cache.
+
+    Returns:
+        The prefix, which includes the current Symfem version
+    """
+    import symfem
+
+    return f"symfem-{symfem.__version__}-"
+
+
+@functools.cache
+def numpy_namespace() -> dict[str, typing.Any]:
+    """Get the namespace that functions created by sympy.lambdify are run in.
+
+    Returns:
+        The namespace
+    """
+    import sympy
+
+    return sympy.lambdify([], 0, modules="numpy").__globals__
+
+
+def compile_basis(
+    element: FiniteElement, cache_key: str | None = None
+) -> typing.Callable[[NDArray[float64]], NDArray[float64]] | None:
+    """Compile the basis functions of a Symfem element into a vectorised function.
+
+    The basis functions are converted to Python code using sympy.lambdify with common
+    subexpression elimination. If a cache key is given, the generated code is saved in the
+    cache so that the element does not need to be compiled again. As the code is run, it is
+    never exported to or imported from cache bundles, so only code generated locally is run.
+
+    Args:
+        element: Symfem element
+        cache_key: Key identifying the element and example, or None if the generated code
+            should not be cached
+
+    Returns:
+        A function that tabulates the basis functions at a set of points, or None if the
+        basis functions cannot be compiled (eg if they are piecewise)
+    """
+    import numpy as np
+    import sympy
+    from symfem.functions import MatrixFunction, ScalarFunction, VectorFunction
+    from symfem.symbols import x
+
+    basis = element.get_basis_functions()
+    if not all(isinstance(f, (ScalarFunction, VectorFunction, MatrixFunction)) for f in basis):
+        return None
+
+    item_key = f"symfem-basis-{cache_key}"
+    item_hash = content_hash(cache_key, symfem_source_hash(element), sympy.__version__)
+    source = None if cache_key is None else load_cache(item_key, item_hash)
+    if source is None:
+        # Components of each basis function, in the order used by tabulate_basis
+        values = []
+        for f in basis:
+            value = f.as_sympy()
+            values += list(value) if isinstance(f, (VectorFunction, MatrixFunction)) else [value]
+        generated = sympy.lambdify(list(x), values, modules="numpy", cse=True)
+        source = inspect.getsource(generated)
+        if cache_key is not None:
+            save_cache(item_key, item_hash, source)
+
+    namespace = dict(numpy_namespace())
+    exec(source, namespace)
+    function = namespace["_lambdifygenerated"]
+    ndofs = len(basis)
+    range_dim = element.range_dim
+
+    def tabulate(points: NDArray[float64]) -> NDArray[float64]:
+        """Tabulate the basis functions.
+
+        Args:
+            points: Points to tabulate at
+
+        Returns:
+            Values of basis functions
+        """
+        npts = points.shape[0]
+        coords = [points[:, i] if i < points.shape[1] else np.zeros(npts) for i in range(3)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = function(*coords)
+        # Constant components are evaluated as scalars, so are broadcast to every point
+        table = np.stack([np.broadcast_to(v, (npts,)) for v in values], axis=-1)
+        table = table.astype(float64).reshape(npts, ndofs, range_dim).transpose(0, 2, 1)
+
+        # Rational basis functions (eg on pyramids) cannot be evaluated numerically at
+        # their singularities, so these points are evaluated symbolically
+        singular = ~np.isfinite(table).all(axis=(1, 2))
+        if singular.any():
+            symbolic = to_array(element.tabulate_basis(points[singular], "xx,yy,zz"))  # type: ignore
+            assert not isinstance(symbolic, float)
+            table[singular] = symbolic.reshape(-1, range_dim, ndofs)
+        return table
+
+    return tabulate
+
+
 class CachedSymfemTabulator:
-    """Symfem tabulator with caching."""
+    """Symfem tabulator with caching.
 
-    def __init__(self, element: FiniteElement):
+    The basis functions are compiled into a vectorised function using compile_basis if
+    possible; otherwise they are evaluated symbolically. Tables are cached in memory and, if
+    a cache key is given, in the array cache on disk. Tables on disk are keyed on the cache
+    key, the Symfem source that the element depends on and the points, so that they are
+    invalidated when Symfem changes. Tables in memory are looked up using a hash of the
+    points, and the least recently used tables are evicted when there are more than
+    max_tables of them.
+    """
+
+    def __init__(self, element: FiniteElement, cache_key: str | None = None, max_tables: int = 8):
         """Initialise.
 
         Args:
             element: Symfem element
+            cache_key: Key identifying the element and example, or None if tables should not
+                be cached on disk
+            max_tables: The maximum number of tables to keep in memory
         """
         self.element = element
-        self.tables: list[tuple[NDArray[float64], NDArray[float64]]] = []
+        self.cache_key = cache_key
+        self.max_tables = max_tables
+        self.tables: OrderedDict[str, NDArray[float64]] = OrderedDict()
+        self._compiled: typing.Callable[[NDArray[float64]], NDArray[float64]] | None = None
+        self._compiled_tried = False
+
+    def _remember(self, points_hash: str, table: NDArray[float64]):
+        """Keep a table in memory.
+
+        Args:
+            points_hash: Hash of the points the table was tabulated at
+            table: The table
+        """
+        self.tables[points_hash] = table
+        while len(self.tables) > self.max_tables:
+            self.tables.popitem(last=False)
 
     def tabulate(self, points: NDArray[float64]) -> NDArray[float64]:
         """Tabulate this element.
@@ -59,16 +247,31 @@ class CachedSymfemTabulator:
         Returns:
             Values of basis functions
         """
-        import numpy as np
-
-        for i, j in self.tables:
-            if i.shape == points.shape and np.allclose(i, points):
-                return j
+        points_hash = array_hash(points)
+        if points_hash in self.tables:
+            self.tables.move_to_end(points_hash)
+            return self.tables[points_hash]
         shape = (points.shape[0], self.element.range_dim, self.element.space_dim)
-        table = to_array(self.element.tabulate_basis(points, "xx,yy,zz"))  # type: ignore
-        assert not isinstance(table, float)
-        table = table.reshape(shape)
-        self.tables.append((points, table))
+        array_key = None
+        if self.cache_key is not None:
+            table_hash = content_hash(self.cache_key, symfem_source_hash(self.element), points_hash)
+            array_key = f"{array_key_prefix()}{table_hash}"
+            cached = load_array(array_key)
+            if cached is not None and cached.shape == shape:
+                self._remember(points_hash, cached)
+                return cached
+        if not self._compiled_tried:
+            self._compiled = compile_basis(self.element, self.cache_key)
+            self._compiled_tried = True
+        if self._compiled is None:
+            symbolic = to_array(self.element.tabulate_basis(points, "xx,yy,zz"))  # type: ignore
+            assert not isinstance(symbolic, float)
+            table = symbolic.reshape(shape)
+        else:
+            table = self._compiled(points)
+        if array_key is not None:
+            save_array(array_key, table)
+        self._remember(points_hash, table)
         return table
 
 
@@ -118,6 +321,13 @@ class SymfemImplementation(Implementation):
         out += ")"
         return out
 
+    @classmethod
+    def prepare_verification(cls):
+        """Prepare to run verification."""
+        super().prepare_verification()
+        # Sympy fills this namespace the first time lambdify is called
+        numpy_namespace()
+
     @classmethod
     def verify(
         cls,
@@ -129,20 +339,20 @@ class SymfemImplementation(Implementation):
         example: str,
     ) -> tuple[list[list[list[int]]], typing.Callable[[NDArray[float64]], NDArray[float64]]]:
         """Get verification data."""
-        import symfem
-
-        if reference == "dual polygon":
-            reference += "(4)"
-        e = symfem.create_element(reference, name, degree, **params)  # type: ignore
+        e = _create_element(reference, name, degree, tuple(sorted(params.items())))
         edofs = [
             [e.entity_dofs(i, j) for j in range(e.reference.sub_entity_count(i))]
             for i in range(e.reference.tdim + 1)
         ]
-        t = CachedSymfemTabulator(e)
+        t = CachedSymfemTabulator(
+            e,
+            content_hash(name, reference, degree, params, example),
+        )
         return edofs, lambda points: t.tabulate(points)
 
     id = "symfem"
     name = "Symfem"
     url = "https://github.com/mscroggs/symfem"
     verification = True
+    verification_modules = ["symfem"]
     languages = ["python"]
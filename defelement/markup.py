@@ -47,7 +47,9 @@ def plot_element(matches: typing.Match[str]) -> str:
     else:
         e = symfem.create_element(matches[1], matches[2], int(matches[3]))
 
-    return f"<center>{''.join([plotting.plot_function(e, i) for i in range(e.space_dim)])}</center>"
+    cache_hash = plotting.plot_hash(e)
+    plots = [plotting.plot_function(e, i, cache_hash=cache_hash) for i in range(e.space_dim)]
+    return f"<center>{''.join(plots)}</center>"
 
 
 def plot_single_element(matches: typing.Match[str]) -> str:
@@ -65,7 +67,8 @@ def plot_single_element(matches: typing.Match[str]) -> str:
     else:
         e = symfem.create_element(matches[1], matches[2], int(matches[3]))
 
-    return f"<center>{plotting.plot_function(e, int(matches[4]))}</center>"
+    cache_hash = plotting.plot_hash(e)
+    return f"<center>{plotting.plot_function(e, int(matches[4]), cache_hash=cache_hash)}</center>"
 
 
 def plot_reference(matches: typing.Match[str]) -> str:
@@ -1,6 +1,5 @@
 """Plotting."""
 
-import base64
 import os
 import typing
 from datetime import datetime
@@ -11,7 +10,13 @@ from symfem.finite_element import FiniteElement
 from symfem.plotting import Picture
 
 from defelement import settings
-from defelement.caching import load_cache, save_cache
+from defelement.caching import (
+    cache_lock,
+    content_hash,
+    element_hash,
+    load_cache_file,
+    save_cache_file,
+)
 
 now = datetime.now()
 svg_desc = (
@@ -67,7 +72,7 @@ def do_the_plot(
     png_width: int = 180,
     scale: int = 250,
     link: bool = True,
-    cache_element: FiniteElement | None = None,
+    cache_hash: str | None = None,
 ) -> str:
     """Create a plot.
 
@@ -79,6 +84,7 @@ def do_the_plot(
         png_width: PNG width
         scale: Scale
         link: Should a link be included?
+        cache_hash: Hash of the inputs to the plot, or None if the plot should not be cached
 
     Returns:
         HTML for plot
@@ -117,21 +123,14 @@ def do_the_plot(
                 ),
             ),
         ]:
-            c = None
-            if cache_element is not None:
-                c = load_cache(f"plot-{fname}", cache_element.last_updated)
-            if c is not None:
-                with open(os.path.join(settings.htmlimg_path, fname), "wb") as f:
-                    f.write(base64.b64decode(c))
+            path = os.path.join(settings.htmlimg_path, fname)
+            if cache_hash is None:
+                pf(path)
             else:
-                pf(os.path.join(settings.htmlimg_path, fname))
-                if cache_element is not None:
-                    with open(os.path.join(settings.htmlimg_path, fname), "rb") as f:
-                        save_cache(
-                            f"plot-{fname}",
-                            cache_element.last_updated,
-                            base64.b64encode(f.read()).decode("utf-8"),
-                        )
+                with cache_lock(f"plot-{fname}"):
+                    if not load_cache_file(f"plot-{fname}", cache_hash, path):
+                        pf(path)
+                        save_cache_file(f"plot-{fname}", cache_hash, path)
 
         img_page = heading_with_self_ref("h1", cap_first(desc))
         img_page += f"<center><a href='/img/{filename}-large.png'>"
@@ -192,23 +191,55 @@ def plot_reference(ref, link: bool = True) -> str:
     )
 
 
-def plot_function(element: FiniteElement, dof_i: int, link: bool = True) -> str:
+def _reference_id(element: FiniteElement) -> str:
+    """Get the name of an element's reference cell used in plot filenames.
+
+    Args:
+        element: The element
+
+    Returns:
+        The name of the reference cell
+    """
+    if element.reference.name == "dual polygon":
+        ref = element.reference
+        assert isinstance(ref, symfem.references.DualPolygon)
+        return f"dual-polygon-{ref.number_of_triangles}"
+    return element.reference.name
+
+
+def plot_hash(element: FiniteElement) -> str:
+    """Compute the hash used to validate cached plots of an element.
+
+    The same plots are used on several pages (eg markup pages and example pages), so the
+    hash only depends on the Symfem element and every page uses the same cache entries.
+
+    Args:
+        element: The element
+
+    Returns:
+        Hex digest of the hash
+    """
+    return element_hash(
+        content_hash(element.name, element.init_kwargs(), _reference_id(element), element.order),
+        element,
+    )
+
+
+def plot_function(
+    element: FiniteElement, dof_i: int, link: bool = True, cache_hash: str | None = None
+) -> str:
     """Plot a functions.
 
     Args:
         element: The element
         dof_i: The DOF index
         link: Should a link be included?
+        cache_hash: Hash of the inputs to the plot, or None if the plot should not be cached
 
     Returns:
         HTML for plot
     """
-    if element.reference.name == "dual polygon":
-        ref = element.reference
-        assert isinstance(ref, symfem.references.DualPolygon)
-        ref_id = f"dual-polygon-{ref.number_of_triangles}"
-    else:
-        ref_id = element.reference.name
+    ref_id = _reference_id(element)
 
     desc = f"Basis function in a {element.name} space"
     filename = f"element-{element.name}"
@@ -221,16 +252,19 @@ def plot_function(element: FiniteElement, dof_i: int, link: bool = True) -> str:
         element.plot_basis_function,
         [dof_i],
         link=link,
-        cache_element=element,
+        cache_hash=cache_hash,
     )
 
 
-def plot_basis_functions(element: FiniteElement, link: bool = True) -> list[str | None]:
+def plot_basis_functions(
+    element: FiniteElement, link: bool = True, cache_hash: str | None = None
+) -> list[str | None]:
     """Plot basis functions of an element.
 
     Args:
         element: The element
         link: Should a link be included?
+        cache_hash: Hash of the inputs to the plots, or None if the plots should not be cached
 
     Returns:
         HTML for plot
@@ -242,7 +276,10 @@ def plot_basis_functions(element: FiniteElement, link: bool = True) -> list[str
         if element.range_dim != element.domain_dim:
             return [None for i in range(element.space_dim)]
 
-    return [plot_function(element, i, link=link) for i in range(element.space_dim)]
+    return [
+        plot_function(element, i, link=link, cache_hash=cache_hash)
+        for i in range(element.space_dim)
+    ]
 
 
 def _parse_point(points: list[str], n: int) -> tuple[float, float]:
@@ -313,22 +350,20 @@ def plot_img(img_filename: str, link: bool = True) -> str:
     return do_the_plot(filename, desc, actual_plot, link=link)
 
 
-def plot_dof_diagram(element: FiniteElement, link: bool = True) -> str:
+def plot_dof_diagram(
+    element: FiniteElement, link: bool = True, cache_hash: str | None = None
+) -> str:
     """Plot a DOF diagram.
 
     Args:
         element: The element
         link: Should a link be included?
+        cache_hash: Hash of the inputs to the plot, or None if the plot should not be cached
 
     Returns:
         HTML for plot
     """
-    if element.reference.name == "dual polygon":
-        ref = element.reference
-        assert isinstance(ref, symfem.references.DualPolygon)
-        ref_id = f"dual-polygon-{ref.number_of_triangles}"
-    else:
-        ref_id = element.reference.name
+    ref_id = _reference_id(element)
     desc = "DOFs of "
     desc += "an" if element.name.lower()[0] in "aieou" else "a"
     desc += f" {element.name} element"
@@ -341,5 +376,5 @@ def plot_dof_diagram(element: FiniteElement, link: bool = True) -> str:
         desc,
         element.plot_dof_diagram,
         link=link,
-        cache_element=element,
+        cache_hash=cache_hash,
     )
@@ -14,6 +14,7 @@ data_path = _os.path.join(dir_path, "data")
 img_path = _os.path.join(dir_path, "img")
 
 cache_path = _os.path.join(dir_path, ".defelement-build-cache")
+array_cache_path = _os.path.join(dir_path, ".defelement-verification-cache")
 
 html_path = _os.path.join(dir_path, "_html")
 htmlelement_path = _os.path.join(html_path, "elements")
@@ -23,11 +24,31 @@ htmlfamilies_path = _os.path.join(html_path, "families")
 
 verification_json = _os.path.join(dir_path, "verification.json")
 verification_history_json = _os.path.join(dir_path, "verification-history.json")
+verification_inputs_json = _os.path.join(dir_path, "verification-inputs.json")
+verification_timings_json = _os.path.join(dir_path, "verification-timings.json")
+verification_timings_history_json = _os.path.join(dir_path, "verification-timings-history.json")
+verification_checkpoint_jsonl = _os.path.join(dir_path, "verification-checkpoint.jsonl")
+verification_shard_timings_json = _os.path.join(dir_path, "verification-shard-timings.json")
+verification_degrees_json = _os.path.join(dir_path, "verification-degrees.json")
+verification_degrees_timings_json = _os.path.join(dir_path, "verification-degrees-timings.json")
 
 github_token: str | None = None
 
 processes = 1
 caching = True
+cache_backend = "sqlite"
+cache_size_limit: int | None = None
+cache_locking = False
+verification_timeout: float | None = None
+verification_memory_limit: int | None = None
+verification_max_tasks_per_child: int | None = 50
+verification_parallel_implementations = False
+verification_server_processes: int | None = None
+verification_server_elements = 16
+verification_profile_path: str | None = None
+verification_profile_threshold = 10.0
+verification_sketch = False
+verification_oversampling: float | None = 2.0
 
 owners = ["mscroggs"]
 with open(_os.path.join(data_path, "editors")) as f:
@@ -69,6 +90,18 @@ def set_processes(n: int):
     processes = n
 
 
+def set_cache_backend(backend: str):
+    """Set cache backend."""
+    global cache_backend
+    cache_backend = backend
+
+
+def set_cache_size_limit(limit: int | None):
+    """Set maximum size of cache in bytes."""
+    global cache_size_limit
+    cache_size_limit = limit
+
+
 def set_github_token(token):
     """Set Github token."""
     global github_token
@@ -80,6 +113,20 @@ def set_verification_json(vj: str):
     """Set path of verification JSON."""
     global verification_json
     global verification_history_json
+    global verification_inputs_json
+    global verification_timings_json
+    global verification_timings_history_json
+    global verification_checkpoint_jsonl
+    global verification_shard_timings_json
+    global verification_degrees_json
+    global verification_degrees_timings_json
     assert vj.endswith(".json")
     verification_json = vj
     verification_history_json = f"{vj[:-5]}-history.json"
+    verification_inputs_json = f"{vj[:-5]}-inputs.json"
+    verification_timings_json = f"{vj[:-5]}-timings.json"
+    verification_timings_history_json = f"{vj[:-5]}-timings-history.json"
+    verification_checkpoint_jsonl = f"{vj[:-5]}-checkpoint.jsonl"
+    verification_shard_timings_json = f"{vj[:-5]}-shard-timings.json"
+    verification_degrees_json = f"{vj[:-5]}-degrees.json"
+    verification_degrees_timings_json = f"{vj[:-5]}-degrees-timings.json"
@@ -1,20 +1,41 @@
 """Verification."""
 
+import functools
 import typing
 
 import symfem
 
 from defelement.tools import to_array
 
-from numpy import float64
+from numpy import float64, floating, int64
 from numpy.typing import NDArray
 
 
-def points(ref: str) -> NDArray[float64]:
+# Topological dimension of each cell that can be tabulated at
+tdims = {
+    "interval": 1,
+    "triangle": 2,
+    "quadrilateral": 2,
+    "tetrahedron": 3,
+    "hexahedron": 3,
+    "prism": 3,
+    "pyramid": 3,
+}
+# Number of subdivisions along each axis of the tabulation grids for each dimension
+grid_sizes = {1: 20, 2: 15, 3: 10}
+
+
+@functools.cache
+def points(ref: str, n: int | None = None) -> NDArray[float64]:
     """Get tabulation points for a reference cell.
 
+    The points are computed once for each cell type and grid size. The array returned is
+    read-only, as it is shared between all callers.
+
     Args:
         ref: Reference cell
+        n: The number of subdivisions along each axis. If this is not given, the size in
+            grid_sizes is used
 
     Returns:
         Set of points
@@ -22,51 +43,68 @@ def points(ref: str) -> NDArray[float64]:
     import numpy as np
 
     if ref == "point":
-        return np.array([[0.0]])
-
-    if ref == "interval":
-        return np.array([[i / 20] for i in range(21)])
-
-    if ref == "quadrilateral":
-        return np.array([[i / 15, j / 15] for i in range(16) for j in range(16)])
-    if ref == "triangle":
-        return np.array([[i / 15, j / 15] for i in range(16) for j in range(16 - i)])
-
-    if ref == "hexahedron":
-        return np.array(
-            [[i / 10, j / 10, k / 10] for i in range(11) for j in range(11) for k in range(11)]
-        )
-    if ref == "tetrahedron":
-        return np.array(
-            [
-                [i / 10, j / 10, k / 10]
-                for i in range(11)
-                for j in range(11 - i)
-                for k in range(11 - i - j)
-            ]
-        )
-    if ref == "prism":
-        return np.array(
-            [[i / 10, j / 10, k / 10] for i in range(11) for j in range(11 - i) for k in range(11)]
-        )
-    if ref == "pyramid":
-        return np.array(
-            [
-                [i / 10, j / 10, k / 10]
-                for i in range(11)
-                for j in range(11)
-                for k in range(11 - max(i, j))
-            ]
-        )
+        pts = np.zeros((1, 1))
+    elif ref in tdims:
+        tdim = tdims[ref]
+        if n is None:
+            n = grid_sizes[tdim]
+        # Integer coordinates of every point in the grid, in lexicographic order
+        axes = np.meshgrid(*[np.arange(n + 1)] * tdim, indexing="ij")
+        grid = np.stack(axes, axis=-1).reshape(-1, tdim)
+        if ref in ["triangle", "tetrahedron"]:
+            grid = grid[grid.sum(axis=1) <= n]
+        elif ref == "prism":
+            grid = grid[grid[:, 0] + grid[:, 1] <= n]
+        elif ref == "pyramid":
+            grid = grid[np.maximum(grid[:, 0], grid[:, 1]) + grid[:, 2] <= n]
+        pts = grid / n
+    else:
+        raise ValueError(f"Unsupported cell type: {ref}")
+
+    pts.flags.writeable = False
+    return pts
+
+
+def grid_size(ref: str, degree: int | None, ndofs: int, oversampling: float) -> int | None:
+    """Get the size of tabulation grid to use for an element.
+
+    The grid on a cell with n subdivisions along each axis is unisolvent for the
+    polynomials of degree n (for simplices) or of degree n in each variable (for tensor
+    product cells), so the smallest grid that has at least n subdivisions and at least
+    oversampling times as many points as the element has DOFs is used. The implementation
+    being verified may not span the same space as Symfem's element, and a small grid could
+    miss the difference (eg a bubble that vanishes at every point of the grid), so the grid
+    is never smaller than the one given in grid_sizes.
 
-    raise ValueError(f"Unsupported cell type: {ref}")
+    Args:
+        ref: Reference cell
+        degree: The degree of the Lagrange space that contains the element, or None if the
+            element is not contained in a Lagrange space (eg if it is piecewise)
+        ndofs: The number of DOFs of the element
+        oversampling: The ratio between the number of points and the number of DOFs
 
+    Returns:
+        The number of subdivisions along each axis, or None if the grid sizes in grid_sizes
+        should be used
+    """
+    if degree is None or ref not in tdims or ref == "pyramid":
+        return None
+    n = max(degree, grid_sizes[tdims[ref]])
+    while points(ref, n).shape[0] < oversampling * ndofs:
+        n += 1
+    return n
 
-def entity_points(ref: str) -> list[list[NDArray[float64]]]:
+
+@functools.cache
+def entity_points(ref: str, n: int | None = None) -> list[list[NDArray[float64]]]:
     """Get tabulation points for sub-entities of a reference cell.
 
+    The points are computed once for each cell type and grid size. The arrays returned are
+    read-only, as they are shared between all callers.
+
     Args:
         ref: Reference cell
+        n: The number of subdivisions along each axis
 
     Returns:
         Set of points
@@ -77,17 +115,78 @@ def entity_points(ref: str) -> list[list[NDArray[float64]]]:
     out = []
     for d in range(r.tdim):
         row = []
-        for n in range(r.sub_entity_count(d)):
-            e = r.sub_entity(d, n)
-            epts = points(e.name)
-            row.append(
-                np.array(
-                    [
-                        to_array(e.origin) + sum(i * to_array(a) for i, a in zip(p, e.axes))  # type: ignore
-                        for p in epts
-                    ]
-                )
-            )
+        for i in range(r.sub_entity_count(d)):
+            e = r.sub_entity(d, i)
+            if d == 0:
+                pts = np.array([to_array(e.origin)])
+            else:
+                pts = to_array(e.origin) + points(e.name, n) @ to_array(e.axes)
+            pts.flags.writeable = False
+            row.append(pts)
+        out.append(row)
+    return out
+
+
+@functools.cache
+def concatenated_entity_points(
+    ref: str, n: int | None = None
+) -> tuple[NDArray[float64], list[list[slice]]]:
+    """Get tabulation points for all sub-entities of a reference cell in a single array.
+
+    This allows the basis functions to be tabulated at the points of every sub-entity with
+    a single call. The points are computed once for each cell type and grid size.
+
+    Args:
+        ref: Reference cell
+        n: The number of subdivisions along each axis
+
+    Returns:
+        The points, and the slice of the points that belong to each sub-entity
+    """
+    import numpy as np
+
+    epoints = entity_points(ref, n)
+    slices = []
+    start = 0
+    for epoints_d in epoints:
+        row = []
+        for pts in epoints_d:
+            row.append(slice(start, start + pts.shape[0]))
+            start += pts.shape[0]
+        slices.append(row)
+    if start == 0:
+        all_pts = np.zeros((0, 0))
+    else:
+        all_pts = np.concatenate([pts for epoints_d in epoints for pts in epoints_d])
+    all_pts.flags.writeable = False
+    return all_pts, slices
+
+
+@functools.cache
+def closure_index(ref: str) -> list[list[NDArray[int64]]]:
+    """Get the sub-entities in the closure of each sub-entity of a reference cell.
+
+    The sub-entities of the cell are numbered globally by dimension and then by their
+    number within that dimension. The index is computed once for each cell type.
+
+    Args:
+        ref: Reference cell
+
+    Returns:
+        The global numbers of the sub-entities in the closure of each sub-entity, in
+        increasing order
+    """
+    import numpy as np
+
+    r = symfem.create_reference(ref)
+    entities = [e for dim in range(r.tdim + 1) for e in r.sub_entities(dim)]
+    out = []
+    for dim in range(r.tdim + 1):
+        row = []
+        for e in r.sub_entities(dim):
+            index = np.array([n for n, se in enumerate(entities) if set(se).issubset(e)])
+            index.flags.writeable = False
+            row.append(index)
         out.append(row)
     return out
 
@@ -102,72 +201,329 @@ def closure_dofs(entity_dofs: list[list[list[int]]], ref: str) -> list[list[list
     Returns:
         Entity closure DOFs
     """
-    r = symfem.create_reference(ref)
-    out: list[list[list[int]]] = [[[] for j in i] for i in entity_dofs]
-    for dim in range(r.tdim + 1):
-        for e_n, e in enumerate(r.sub_entities(dim)):
-            for subdim in range(dim + 1):
-                for se_n, se in enumerate(r.sub_entities(subdim)):
-                    if all(i in e for i in se):
-                        out[dim][e_n] += entity_dofs[subdim][se_n]
+    import numpy as np
+
+    flat_dofs = [dofs for i in entity_dofs for dofs in i]
+    dofs = np.array([d for i in flat_dofs for d in i], dtype=np.int64)
+    offsets = np.cumsum([0] + [len(i) for i in flat_dofs])
+    out = []
+    for row in closure_index(ref):
+        out_row = []
+        for index in row:
+            # Gather the DOFs of each sub-entity in the closure
+            lengths = offsets[index + 1] - offsets[index]
+            starts = np.repeat(offsets[index] - np.cumsum(lengths) + lengths, lengths)
+            out_row.append(dofs[starts + np.arange(lengths.sum())].tolist())
+        out.append(out_row)
     return out
 
 
-def same_span(table0: NDArray[float64], table1: NDArray[float64], complete: bool = True) -> bool:
-    """Check if two tables span the same space.
+# Absolute tolerance on the Frobenius norm of the part of a table that lies outside the span
+# of another table. Tables whose residual after projection is larger than this do not span
+# the same space.
+span_tolerance = 1e-8
+# The number of random combinations of basis functions used by Span.excludes
+sketch_size = 4
+
+
+def _rank(singular_values: NDArray[floating], shape: tuple[int, ...]) -> int:
+    """Get the numerical rank of a matrix from its singular values.
+
+    This uses the same tolerance as numpy.linalg.matrix_rank.
 
     Args:
-        table0: First table
-        table1: Second table
-        complete: Should the tables have full rank?
+        singular_values: The singular values of the matrix
+        shape: The shape of the matrix
 
     Returns:
-        True if span is the same, otherwise False
+        The rank
     """
     import numpy as np
 
-    if table0.shape != table1.shape:
-        return False
+    tol = singular_values.max(initial=0.0) * max(shape) * np.finfo(float64).eps
+    return int(np.count_nonzero(singular_values > tol))
+
+
+class Span:
+    """The space spanned by the basis functions in a table."""
+
+    def __init__(self, table: NDArray[float64]):
+        """Create.
+
+        The singular value decomposition of the table is computed once, so that other
+        tables can be compared against this table cheaply.
+
+        Args:
+            table: The table, with the basis functions along the last axis
+        """
+        import numpy as np
+
+        self.shape = table.shape
+        matrix = table.reshape(-1, table.shape[-1])
+        u, s, _ = np.linalg.svd(matrix, full_matrices=False)
+        self.rank = _rank(s, matrix.shape)
+        self.basis = u[:, : self.rank]
+
+    def excludes(self, table: NDArray[float64]) -> bool:
+        """Check cheaply if a table is certainly not contained in this space.
+
+        The table is multiplied by a random matrix R with sketch_size columns and the result
+        is projected onto this space. The norm of the residual of the projection of the table
+        is at least the norm of the residual for this sketch divided by the largest singular
+        value of R, so if this is larger than span_tolerance, the table is not contained in
+        this space. If this function returns False, the table may or may not be contained in
+        this space.
+
+        Args:
+            table: The table
+
+        Returns:
+            True if the table is not contained in this space
+        """
+        import numpy as np
+
+        ndofs = table.shape[-1]
+        if ndofs <= sketch_size:
+            return False
+
+        r = np.random.default_rng(0).standard_normal((ndofs, sketch_size))
+        sketch = table.reshape(-1, ndofs) @ r
+        residual = sketch - self.basis @ (self.basis.T @ sketch)
+        # The factor of 2 is a margin for rounding errors
+        return bool(np.linalg.norm(residual) > 2 * span_tolerance * np.linalg.norm(r, 2))
+
+    def same_span(
+        self, table: NDArray[float64], complete: bool = True, sketch: bool = False
+    ) -> bool:
+        """Check if a table spans this space.
+
+        The table spans this space if the residual of its projection onto an orthonormal
+        basis of this space is at most span_tolerance and the projected table has the same
+        rank as this space.
+
+        Args:
+            table: The table
+            complete: Should the tables have full rank?
+            sketch: Should excludes be used to find tables that do not span this space
+                before the full check is done? This gives the same result, but is faster
+                for tables that do not span this space.
+
+        Returns:
+            True if span is the same, otherwise False
+        """
+        import numpy as np
+
+        if table.shape != self.shape:
+            return False
+
+        ndofs = table.shape[-1]
+        if complete and self.rank != ndofs:
+            return False
+        if sketch and self.excludes(table):
+            return False
+
+        matrix = table.reshape(-1, ndofs)
+        coefficients = self.basis.T @ matrix
+        if np.linalg.norm(matrix - self.basis @ coefficients) > span_tolerance:
+            return False
+        # As the table lies in this space, its rank is the rank of its coefficients
+        s = np.linalg.svd(coefficients, compute_uv=False)
+        return _rank(s, matrix.shape) == self.rank
+
+
+class VerificationInfo:
+    """Verification information for an implementation of an element."""
+
+    def __init__(
+        self,
+        entity_dofs: list[list[list[int]]],
+        tabulate: typing.Callable[[NDArray[float64]], NDArray[float64]],
+    ):
+        """Create.
+
+        Args:
+            entity_dofs: Lists of DOFs associated with each entity
+            tabulate: Function that tabulates the basis functions at a set of points
+        """
+        self.entity_dofs = entity_dofs
+        self.tabulate = tabulate
+        self._closure_dofs: dict[str, list[list[list[int]]]] = {}
+        self._spans: dict[tuple[str, int | None, int, int] | tuple[str, int | None], Span] = {}
+        self._entity_tables: dict[tuple[str, int | None], NDArray[float64]] = {}
+        self._exterior_dofs: dict[str, list[list[NDArray[int64]]]] = {}
+        self._exterior_tables: dict[tuple[str, int | None, int, int], NDArray[float64]] = {}
+
+    def closure_dofs(self, ref: str) -> list[list[list[int]]]:
+        """Get lists of DOFs associated with the closure of each entity.
+
+        These are computed the first time they are needed and reused afterwards.
+
+        Args:
+            ref: Reference cell
+
+        Returns:
+            Entity closure DOFs
+        """
+        if ref not in self._closure_dofs:
+            self._closure_dofs[ref] = closure_dofs(self.entity_dofs, ref)
+        return self._closure_dofs[ref]
+
+    def span(self, ref: str, n: int | None = None) -> Span:
+        """Get the space spanned by the basis functions.
+
+        Args:
+            ref: Reference cell
+            n: The number of subdivisions along each axis of the tabulation grid
+
+        Returns:
+            The span of the basis functions tabulated at the points of the cell
+        """
+        if (ref, n) not in self._spans:
+            self._spans[(ref, n)] = Span(self.tabulate(points(ref, n)))
+        return self._spans[(ref, n)]
+
+    def entity_table(self, ref: str, n: int | None = None) -> NDArray[float64]:
+        """Tabulate the basis functions at the points of every sub-entity.
+
+        Args:
+            ref: Reference cell
+            n: The number of subdivisions along each axis of the tabulation grid
+
+        Returns:
+            The basis functions tabulated at the points returned by
+            concatenated_entity_points
+        """
+        if (ref, n) not in self._entity_tables:
+            self._entity_tables[(ref, n)] = self.tabulate(concatenated_entity_points(ref, n)[0])
+        return self._entity_tables[(ref, n)]
+
+    def add_tables(
+        self, ref: str, n: int | None, span: Span, entity_table: NDArray[float64]
+    ) -> None:
+        """Add a span and entity table that were computed elsewhere.
+
+        This allows the tables of an element to be computed once and sent to other processes,
+        rather than tabulating the element again in every process.
+
+        Args:
+            ref: Reference cell
+            n: The number of subdivisions along each axis of the tabulation grid
+            span: The span of the basis functions, as returned by span
+            entity_table: The basis functions tabulated at the points of every sub-entity, as
+                returned by entity_table
+        """
+        self._spans[(ref, n)] = span
+        self._entity_tables[(ref, n)] = entity_table
+
+    def exterior_dofs(self, ref: str) -> list[list[NDArray[int64]]]:
+        """Get the DOFs not associated with the closure of each entity.
+
+        Args:
+            ref: Reference cell
+
+        Returns:
+            The DOFs not associated with the closure of each entity
+        """
+        import numpy as np
+
+        if ref not in self._exterior_dofs:
+            flat_dofs = [dofs for i in self.entity_dofs for dofs in i]
+            dofs = np.array([d for i in flat_dofs for d in i], dtype=np.int64)
+            # The global number of the entity that each DOF is associated with
+            dof_entities = np.repeat(np.arange(len(flat_dofs)), [len(i) for i in flat_dofs])
+            self._exterior_dofs[ref] = [
+                [dofs[~np.isin(dof_entities, index)] for index in row] for row in closure_index(ref)
+            ]
+        return self._exterior_dofs[ref]
+
+    def exterior_table(
+        self, ref: str, dim: int, entity: int, n: int | None = None
+    ) -> NDArray[float64]:
+        """Tabulate the basis functions not associated with the closure of an entity.
+
+        Args:
+            ref: Reference cell
+            dim: The dimension of the entity
+            entity: The number of the entity
+            n: The number of subdivisions along each axis of the tabulation grid
+
+        Returns:
+            The basis functions not associated with the closure of the entity, tabulated
+            at the points of the entity
+        """
+        key = (ref, n, dim, entity)
+        if key not in self._exterior_tables:
+            _, slices = concatenated_entity_points(ref, n)
+            table = self.entity_table(ref, n)[slices[dim][entity]]
+            self._exterior_tables[key] = table[:, :, self.exterior_dofs(ref)[dim][entity]]
+        return self._exterior_tables[key]
+
+    def exterior_span(self, ref: str, dim: int, entity: int, n: int | None = None) -> Span:
+        """Get the space spanned by the basis functions not associated with an entity.
+
+        Args:
+            ref: Reference cell
+            dim: The dimension of the entity
+            entity: The number of the entity
+            n: The number of subdivisions along each axis of the tabulation grid
+
+        Returns:
+            The span of the basis functions not associated with the closure of the entity,
+            tabulated at the points of the entity
+        """
+        key = (ref, n, dim, entity)
+        if key not in self._spans:
+            self._spans[key] = Span(self.exterior_table(ref, dim, entity, n))
+        return self._spans[key]
 
-    ndofs = table0.shape[-1]
-    table0 = table0.reshape(-1, ndofs)
-    table1 = table1.reshape(-1, ndofs)
 
-    rank0 = np.linalg.matrix_rank(table0)
-    rank1 = np.linalg.matrix_rank(table1)
-    if complete and rank0 != ndofs:
-        return False
+def same_span(table0: NDArray[float64], table1: NDArray[float64], complete: bool = True) -> bool:
+    """Check if two tables span the same space.
 
-    if rank0 != rank1:
-        return False
+    Args:
+        table0: First table
+        table1: Second table
+        complete: Should the tables have full rank?
 
-    stack = np.hstack([table0, table1])
-    srank = np.linalg.matrix_rank(stack, tol=1e-8)
-    return rank0 == srank
+    Returns:
+        True if span is the same, otherwise False
+    """
+    return Span(table1).same_span(table0, complete)
 
 
 def verify(
     ref: str,
-    info0: tuple[list[list[list[int]]], typing.Callable[[NDArray[float64]], NDArray[float64]]],
-    info1: tuple[list[list[list[int]]], typing.Callable[[NDArray[float64]], NDArray[float64]]],
+    info0: VerificationInfo
+    | tuple[list[list[list[int]]], typing.Callable[[NDArray[float64]], NDArray[float64]]],
+    info1: VerificationInfo
+    | tuple[list[list[list[int]]], typing.Callable[[NDArray[float64]], NDArray[float64]]],
+    sketch: bool = False,
+    n: int | None = None,
 ) -> tuple[bool, str | None]:
     """Run verification.
 
     Args:
         ref: Reference cell
         info0: Verification info for first implementation
-        info1: Verification info for second implementation
+        info1: Verification info for second implementation. If the same implementation is
+            compared against several others, passing a VerificationInfo allows its closure
+            DOFs, tables and their factorisations to be reused
+        sketch: Should randomised sketches be used to find tables that do not span the same
+            space before the full checks are done? This does not change the result
+        n: The number of subdivisions along each axis of the tabulation grids. If this is not
+            given, the sizes in grid_sizes are used
 
     Returns:
         (True, None) if verification successful, otherwise False plus a reason
     """
     import numpy as np
 
-    edofs0, tab0 = info0
-    edofs1, tab1 = info1
-
-    ecdofs0 = closure_dofs(edofs0, ref)
-    ecdofs1 = closure_dofs(edofs1, ref)
+    if not isinstance(info0, VerificationInfo):
+        info0 = VerificationInfo(*info0)
+    if not isinstance(info1, VerificationInfo):
+        info1 = VerificationInfo(*info1)
+    edofs0 = info0.entity_dofs
+    edofs1 = info1.entity_dofs
 
     # Check the same number of entity DOFs
     if len(edofs0) != len(edofs1):
@@ -188,29 +544,25 @@ def verify(
                 )
 
     # Check that polysets span the same space
-    pts = points(ref)
-    table0 = tab0(pts)
-    table1 = tab1(pts)
+    table0 = info0.tabulate(points(ref, n))
+    span1 = info1.span(ref, n)
 
-    if table0.shape != table1.shape:
-        return False, f"Non-matching table shapes ({table0.shape} vs {table1.shape})"
+    if table0.shape != span1.shape:
+        return False, f"Non-matching table shapes ({table0.shape} vs {span1.shape})"
 
-    if not same_span(table0, table1):
+    if not span1.same_span(table0, sketch=sketch):
         return False, "Polysets do not span the same space"
 
     # Check that continuity will be the same
-    epoints = entity_points(ref)
-    for d, epoints_d in enumerate(epoints):
-        for e, pts in enumerate(epoints_d):
-            ed0 = ecdofs0[d][e]
-            if len(ed0) > 0:
-                ed1 = ecdofs1[d][e]
-
-                not_ed0 = [k for i in edofs0 for j in i for k in j if k not in ed0]
-                not_ed1 = [k for i in edofs1 for j in i for k in j if k not in ed1]
-                t0 = tab0(pts)[:, :, not_ed0]
-                t1 = tab1(pts)[:, :, not_ed1]
-                if not np.allclose(t0, t1) and not same_span(t0, t1, False):
+    ecdofs0 = info0.closure_dofs(ref)
+    for d, epoints_d in enumerate(entity_points(ref, n)):
+        for e in range(len(epoints_d)):
+            if len(ecdofs0[d][e]) > 0:
+                t0 = info0.exterior_table(ref, d, e, n)
+                t1 = info1.exterior_table(ref, d, e, n)
+                if np.allclose(t0, t1):
+                    continue
+                if not info1.exterior_span(ref, d, e, n).same_span(t0, False, sketch):
                     return False, f"Continuity does not match for ({d},{e})"
 
     return True, None
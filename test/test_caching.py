@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+import symfem
+
+from defelement import caching, plotting, settings
+from defelement.caching import (
+    cache_lock,
+    cache_version,
+    content_hash,
+    element_hash,
+    export_cache,
+    get_backend,
+    import_cache,
+    load_cache,
+    load_cache_file,
+    merge_statistics,
+    prefetch_cache,
+    save_cache,
+    save_cache_file,
+    statistics_report,
+    take_statistics,
+    tidy_cache,
+)
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def cache_path(tmp_path, monkeypatch, request):
+    monkeypatch.setattr(settings, "cache_path", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "cache_backend", request.param)
+    monkeypatch.setattr(settings, "caching", True)
+    yield tmp_path / "cache"
+    get_backend().close()
+
+
+def test_content_hash_stable():
+    assert content_hash({"a": 1, "b": [1, 2]}, "x") == content_hash({"b": [1, 2], "a": 1}, "x")
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_element_hash():
+    e0 = symfem.create_element("triangle", "Lagrange", 1)
+    e1 = symfem.create_element("triangle", "Lagrange", 2)
+    assert element_hash("def", e0) == element_hash("def", e1)
+    assert element_hash("def", e0) != element_hash("def2", e0)
+
+
+def test_load_and_save(cache_path):
+    assert load_cache("item", "hash0") is None
+    save_cache("item", "hash0", "content")
+    assert load_cache("item", "hash0") == "content"
+    assert load_cache("item", "hash1") is None
+
+
+def test_prefetch(cache_path):
+    save_cache("item0", "hash0", "content0")
+    save_cache("item1", "hash0", "content1")
+    save_cache("item2", "hash1", "content2")
+    prefetch_cache("hash0")
+    assert load_cache("item0", "hash0") == "content0"
+    assert load_cache("item1", "hash0") == "content1"
+    assert load_cache("item2", "hash1") == "content2"
+
+
+def test_tidy(cache_path):
+    save_cache("item0", "hash0", "content0")
+    backend = get_backend()
+    entry = backend.load("item0")
+    assert entry is not None
+    backend.save("item1", {**entry, "cache_version": f"old-{cache_version}"})
+    tidy_cache()
+    assert backend.keys() == ["item0"]
+
+
+def test_files(cache_path, tmp_path):
+    data = bytes(range(256))
+    with open(tmp_path / "in.png", "wb") as f:
+        f.write(data)
+    assert not load_cache_file("plot", "hash0", str(tmp_path / "out.png"))
+    save_cache_file("plot", "hash0", str(tmp_path / "in.png"))
+    assert not load_cache_file("plot", "hash1", str(tmp_path / "out.png"))
+    assert load_cache_file("plot", "hash0", str(tmp_path / "out.png"))
+    with open(tmp_path / "out.png", "rb") as f:
+        assert f.read() == data
+
+
+def test_cached_plot(cache_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "htmlimg_path", str(tmp_path))
+    monkeypatch.setattr(plotting, "all_plots", [])
+    calls = []
+
+    def plot(filename, **kwargs):
+        calls.append(filename)
+        with open(filename, "w") as f:
+            f.write(filename)
+
+    plotting.do_the_plot("test-plot", "Test plot", plot, cache_hash="hash0")
+    assert len(calls) == 4
+
+    plotting.all_plots.remove("test-plot")
+    for file in tmp_path.glob("test-plot*"):
+        file.unlink()
+    plotting.do_the_plot("test-plot", "Test plot", plot, cache_hash="hash0")
+    assert len(calls) == 4
+    with open(tmp_path / "test-plot.svg") as f:
+        assert f.read() == str(tmp_path / "test-plot.svg")
+
+
+def test_eviction(cache_path, monkeypatch):
+    for i in range(5):
+        save_cache(f"item{i}", "hash", "x" * 1000)
+    for i in [0, 3, 4]:
+        assert load_cache(f"item{i}", "hash") is not None
+    monkeypatch.setattr(settings, "cache_size_limit", 3500)
+    tidy_cache()
+    assert sorted(get_backend().keys()) == ["item0", "item3", "item4"]
+    assert sum(u[3] for u in get_backend().usage()) == 3
+
+
+def test_touch_does_not_rewrite_entry(cache_path, monkeypatch):
+    monkeypatch.setattr(settings, "cache_backend", "json")
+    save_cache("item", "hash", "content")
+    with open(cache_path / "item.json") as f:
+        saved = f.read()
+    for _ in range(3):
+        assert load_cache("item", "hash") == "content"
+    with open(cache_path / "item.json") as f:
+        assert f.read() == saved
+    assert get_backend().usage()[0][3] == 3
+
+
+def test_vacuum_only_when_space_freed(cache_path, monkeypatch):
+    monkeypatch.setattr(settings, "cache_backend", "sqlite")
+    for i in range(20):
+        save_cache(f"item{i}", "hash", "x" * 10000)
+    backend = get_backend()
+
+    def free_pages():
+        return backend.connection.execute("PRAGMA freelist_count").fetchone()[0]
+
+    backend.remove("item0")
+    tidy_cache()
+    assert free_pages() > 0
+    for i in range(1, 15):
+        backend.remove(f"item{i}")
+    tidy_cache()
+    assert free_pages() == 0
+
+
+def test_statistics(cache_path):
+    take_statistics()
+    save_cache("plot-a.png", "hash", "content")
+    load_cache("plot-a.png", "hash")
+    load_cache("plot-b.png", "hash")
+    load_cache("markup_example-a", "hash")
+    stats = take_statistics()
+    assert stats == {"plot": (1, 1), "markup_example": (0, 1)}
+    assert merge_statistics(stats, {"plot": (2, 0)}) == {"plot": (3, 1), "markup_example": (0, 1)}
+    assert "plot" in statistics_report(stats)
+
+
+def test_corrupted_entry(cache_path, monkeypatch):
+    monkeypatch.setattr(settings, "cache_backend", "json")
+    save_cache("item", "hash", "content")
+    with open(cache_path / "item.json", "w") as f:
+        f.write('{"content": "cont')
+    assert load_cache("item", "hash") is None
+
+
+def _compute_with_lock(n):
+    with cache_lock("item"):
+        if load_cache("item", "hash") is None:
+            with open(os.path.join(settings.cache_path, f"computed-{n}"), "w") as f:
+                f.write("")
+            time.sleep(0.1)
+            save_cache("item", "hash", "content")
+    return load_cache("item", "hash")
+
+
+def test_lock(cache_path, monkeypatch):
+    monkeypatch.setattr(settings, "cache_locking", True)
+    get_backend()
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(4) as p:
+        assert p.map(_compute_with_lock, range(4)) == ["content"] * 4
+    assert len([f for f in os.listdir(cache_path) if f.startswith("computed-")]) == 1
+
+
+def test_export_and_import(cache_path, tmp_path, monkeypatch):
+    with open(tmp_path / "in.png", "wb") as f:
+        f.write(bytes(range(256)))
+    save_cache("item0", "hash0", "content0")
+    save_cache("item1", "hash1", "content1")
+    save_cache_file("plot", "hash0", str(tmp_path / "in.png"))
+    backend = get_backend()
+    entry = backend.load("item1")
+    assert entry is not None
+    backend.save("item1", {**entry, "symfem_version": "0.0.0"})
+    save_cache("symfem-basis-key", "hash0", "def _lambdifygenerated(x, y, z): ...")
+    assert export_cache(str(tmp_path / "bundle.tar.gz")) == 2
+
+    monkeypatch.setattr(settings, "cache_path", str(tmp_path / "cache2"))
+    save_cache("item0", "hash-newer", "newer")
+    assert import_cache(str(tmp_path / "bundle.tar.gz")) == 1
+    assert load_cache("item0", "hash-newer") == "newer"
+    assert load_cache_file("plot", "hash0", str(tmp_path / "out.png"))
+    with open(tmp_path / "out.png", "rb") as f:
+        assert f.read() == bytes(range(256))
+    assert load_cache("symfem-basis-key", "hash0") is None
+    get_backend().close()
+
+
+def test_import_skips_code(cache_path, tmp_path, monkeypatch):
+    save_cache("symfem-basis-key", "hash0", "def _lambdifygenerated(x, y, z): ...")
+    prefixes = caching.unshared_prefixes
+    monkeypatch.setattr(caching, "unshared_prefixes", [])
+    assert export_cache(str(tmp_path / "bundle.tar")) == 1
+
+    monkeypatch.setattr(caching, "unshared_prefixes", prefixes)
+    monkeypatch.setattr(settings, "cache_path", str(tmp_path / "cache2"))
+    assert import_cache(str(tmp_path / "bundle.tar")) == 0
+    assert load_cache("symfem-basis-key", "hash0") is None
+    get_backend().close()
+
+
+def test_plot_hash():
+    # Markup pages and example pages create the same element in different ways
+    e = symfem.create_element("triangle", "P", 2)
+    assert plotting.plot_hash(e) == plotting.plot_hash(
+        symfem.create_element("triangle", "Lagrange", 2)
+    )
+    assert plotting.plot_hash(e) != plotting.plot_hash(symfem.create_element("triangle", "P", 1))
+    assert plotting.plot_hash(e) != plotting.plot_hash(
+        symfem.create_element("triangle", "P", 2, variant="legendre")
+    )
+
+
+@pytest.mark.parametrize(
+    "cell, name",
+    [("triangle", "Lagrange"), ("triangle", "discontinuous Lagrange"), ("tetrahedron", "N1curl")],
+)
+def test_symfem_element_source_hash(cell, name):
+    # The hash can be computed without creating the element
+    e = symfem.create_element(cell, name, 1)
+    assert caching.symfem_element_source_hash(name, cell) == caching.symfem_source_hash(e)
@@ -1,5 +1,5 @@
 import pytest
-from defelement.implementations import implementations
+from defelement.implementations import implementations, verification_preparations
 from defelement.languages import languages
 
 
@@ -7,3 +7,11 @@ from defelement.languages import languages
 def test_languages(i):
     for lang in implementations[i].languages:
         assert lang in languages
+
+
+@pytest.mark.parametrize("i", verification_preparations)
+def test_prepare_verification(i):
+    try:
+        verification_preparations[i]()
+    except ImportError:
+        pytest.skip(f"{i} is not installed")
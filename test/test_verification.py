@@ -1,10 +1,31 @@
 import os
 
+import numpy as np
+import pytest
+import symfem
 import yaml
 
+from defelement import settings
+from defelement.caching import get_backend, take_statistics
 from defelement.element import Element
 from defelement.implementations import parse_example, verifications
-from defelement.verification import verify
+from defelement.implementations import symfem as symfem_implementation
+from defelement.implementations.symfem import (
+    CachedSymfemTabulator,
+    compile_basis,
+    verification_degree,
+)
+from defelement.tools import to_array
+from defelement.verification import (
+    Span,
+    VerificationInfo,
+    closure_dofs,
+    concatenated_entity_points,
+    entity_points,
+    grid_size,
+    points,
+    verify,
+)
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 element_path = os.path.join(dir_path, "../elements")
@@ -118,3 +139,284 @@ def test_verify_bdm_vs_n2():
     info0 = verifications["symfem"](symfem_name0, reference, symfem_degree0, symfem_params0, e0, eg)
     info1 = verifications["symfem"](symfem_name1, reference, symfem_degree1, symfem_params1, e1, eg)
     assert not verify("triangle", info0, info1)[0]
+
+
+def test_cached_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "array_cache_path", str(tmp_path))
+    monkeypatch.setattr(settings, "caching", True)
+    with open(os.path.join(element_path, "lagrange.def")) as f:
+        data = yaml.load(f, Loader=yaml.FullLoader)
+    e = Element(data, "lagrange")
+
+    eg = [i for i in e.examples if "triangle" in i][0]
+    reference, defelement_degree, variant, kwargs = parse_example(eg)
+    symfem_name, symfem_degree, symfem_params = e.get_implementation_string(
+        "symfem",
+        reference,
+        defelement_degree,
+        variant,
+    )
+
+    pts = points(reference)
+    _, tab0 = verifications["symfem"](symfem_name, reference, symfem_degree, symfem_params, e, eg)
+    table0 = tab0(pts)
+    assert len(os.listdir(tmp_path)) == 1
+
+    _, tab1 = verifications["symfem"](symfem_name, reference, symfem_degree, symfem_params, e, eg)
+    table1 = tab1(pts)
+    assert isinstance(table1, np.memmap)
+    assert np.allclose(table0, table1)
+
+
+def test_cached_tables_invalidated_by_symfem_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "array_cache_path", str(tmp_path / "arrays"))
+    monkeypatch.setattr(settings, "cache_path", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "caching", True)
+    element = symfem.create_element("triangle", "P", 1)
+    pts = points("triangle")
+
+    monkeypatch.setattr(symfem_implementation, "symfem_source_hash", lambda e: "source0")
+    CachedSymfemTabulator(element, "key").tabulate(pts)
+    CachedSymfemTabulator(element, "key").tabulate(pts)
+    assert len(os.listdir(tmp_path / "arrays")) == 1
+
+    monkeypatch.setattr(symfem_implementation, "symfem_source_hash", lambda e: "source1")
+    CachedSymfemTabulator(element, "key").tabulate(pts)
+    assert len(os.listdir(tmp_path / "arrays")) == 2
+
+
+def test_points_cached():
+    pts = points("tetrahedron")
+    assert pts is points("tetrahedron")
+    assert not pts.flags.writeable
+    assert pts.shape == (286, 3)
+    assert np.all(pts.sum(axis=1) <= 1 + 1e-12)
+
+
+def test_grid_size():
+    # Lagrange degree 3 on a triangle: 10 DOFs
+    n = grid_size("triangle", 3, 10, 2.0)
+    assert n == 15
+    assert points("triangle", n).shape == (136, 2)
+    # Lagrange degree 20 on a triangle: 231 DOFs
+    assert grid_size("triangle", 20, 231, 2.0) == 29
+    assert grid_size("triangle", 20, 231, 1.0) == 20
+    assert grid_size("triangle", None, 10, 2.0) is None
+    assert grid_size("pyramid", 1, 5, 2.0) is None
+
+    element = symfem.create_element("triangle", "Lagrange", 3)
+    assert verification_degree("Lagrange", "triangle", 3, {}) == 3
+    assert verification_degree("HCT", "triangle", 3, {}) is None
+    info = VerificationInfo(
+        [
+            [element.entity_dofs(d, i) for i in range(element.reference.sub_entity_count(d))]
+            for d in range(3)
+        ],
+        CachedSymfemTabulator(element).tabulate,
+    )
+    assert verify("triangle", info, info, n=n)[0]
+
+
+def test_grid_size_wrong_space():
+    # An implementation whose basis includes a bubble that vanishes on the boundary of the
+    # cell spans a different space to Lagrange degree 1
+    element = symfem.create_element("triangle", "Lagrange", 1)
+    tabulator = CachedSymfemTabulator(element)
+    entity_dofs = [
+        [element.entity_dofs(d, i) for i in range(element.reference.sub_entity_count(d))]
+        for d in range(3)
+    ]
+
+    def tabulate_with_bubble(pts):
+        tab = tabulator.tabulate(pts).copy()
+        tab[:, 0, 0] += 27 * pts[:, 0] * pts[:, 1] * (1 - pts[:, 0] - pts[:, 1])
+        return tab
+
+    info = VerificationInfo(entity_dofs, tabulator.tabulate)
+    wrong_info = VerificationInfo(entity_dofs, tabulate_with_bubble)
+    n = grid_size("triangle", 1, 3, 2.0)
+    assert verify("triangle", info, info, n=n)[0]
+    assert not verify("triangle", info, wrong_info, n=n)[0]
+
+
+def test_estimate_cost():
+    from verify import estimate_cost
+
+    elements = {}
+    for name in ["lagrange", "nedelec1"]:
+        with open(os.path.join(element_path, f"{name}.def")) as f:
+            elements[name] = Element(yaml.load(f, Loader=yaml.FullLoader), name)
+    assert elements["lagrange"].dof_count("tetrahedron", 2) == 10
+    assert elements["nedelec1"].dof_count("tetrahedron", 2) == 45
+
+    # The vector-valued element has more DOFs at the same degree, so is more expensive
+    tasks = [
+        (elements["lagrange"], "tetrahedron,2,equispaced", ["basix"], {}),
+        (elements["nedelec1"], "tetrahedron,2,lagrange", ["basix"], {}),
+        (elements["lagrange"], "tetrahedron,4,equispaced", ["basix"], {}),
+        (elements["lagrange"], "triangle,1,equispaced", ["basix"], {}),
+    ]
+    costs = [estimate_cost(task, {}) for task in tasks]
+    assert sorted(range(4), key=lambda n: -costs[n]) == [1, 2, 0, 3]
+
+    # Recorded timings are used when they are available
+    timings = {"lagrange": {"triangle,1,equispaced": {"basix": {"total": 1e6}}}}
+    assert estimate_cost(tasks[3], timings) == 1e6
+
+
+def test_sweep_construction_error(monkeypatch):
+    from verify import degree_sweeps, verify_example, verify_sweep
+
+    monkeypatch.setattr(settings, "caching", False)
+    monkeypatch.setattr(settings, "verification_timeout", None)
+    monkeypatch.setattr(settings, "verification_memory_limit", None)
+
+    def basix_verify(name, reference, degree, params, element, example):
+        # Basix raises a RuntimeError when a Lagrange variant is needed but not given
+        if degree > 2 and "lagrange_variant" not in params:
+            raise RuntimeError("Lagrange elements of degree > 2 need to be given a variant")
+        raise NotImplementedError()
+
+    monkeypatch.setitem(verifications, "basix", basix_verify)
+
+    with open(os.path.join(element_path, "nedelec1.def")) as f:
+        e = Element(yaml.load(f, Loader=yaml.FullLoader), "nedelec1")
+    eg = "triangle,3,lagrange"
+    assert e.get_implementation_string("basix", "triangle", 3, "lagrange") == ("N1E", 4, {})
+    sweep = next(s for s in degree_sweeps(e, range(1, 4), ["basix"]) if eg in s[1])
+
+    # The error does not stop the sweep
+    results, _ = verify_sweep(sweep)
+    assert results["nedelec1"]["basix"]["not implemented"] == sweep[1]
+
+    # Outside of sweeps, the error is raised
+    with pytest.raises(RuntimeError):
+        verify_example((e, eg, ["basix"], {}))
+
+
+def test_parallel_implementations_create_symfem_once(monkeypatch):
+    from verify import run_examples
+
+    monkeypatch.setattr(settings, "caching", False)
+    monkeypatch.setattr(settings, "processes", 1)
+    monkeypatch.setattr(settings, "verification_parallel_implementations", True)
+    monkeypatch.setattr(settings, "verification_timeout", None)
+    monkeypatch.setattr(settings, "verification_memory_limit", None)
+    calls = []
+
+    def counted_verify(*args):
+        calls.append(args[-1])
+        return symfem_implementation.SymfemImplementation.verify(*args)
+
+    monkeypatch.setitem(verifications, "symfem", counted_verify)
+
+    with open(os.path.join(element_path, "lagrange.def")) as f:
+        e = Element(yaml.load(f, Loader=yaml.FullLoader), "lagrange")
+    eg = "triangle,1,equispaced"
+    ((_, (results, timings)),) = run_examples([(e, eg, ["symfem", "symfem"], {})], {})
+    assert results["lagrange"]["symfem"]["pass"] == [eg, eg]
+    assert "symfem" in timings
+
+    # Symfem is created once for the Symfem data and once for each implementation that is
+    # verified, rather than once more for every implementation
+    assert calls == [eg, eg, eg]
+
+
+def test_closure_dofs():
+    # Lagrange degree 2 on a triangle: one DOF per vertex and per edge
+    edofs = [[[0], [1], [2]], [[3], [4], [5]], [[]]]
+    info = VerificationInfo(edofs, lambda pts: np.zeros((pts.shape[0], 1, 6)))
+    cdofs = info.closure_dofs("triangle")
+    assert cdofs == closure_dofs(edofs, "triangle")
+    assert cdofs[0] == [[0], [1], [2]]
+    assert cdofs[1] == [[0, 1, 3], [0, 2, 4], [1, 2, 5]]
+    assert cdofs[2] == [[0, 1, 2, 3, 4, 5]]
+    assert info.closure_dofs("triangle") is cdofs
+
+
+def test_span():
+    rng = np.random.default_rng(0)
+    table = rng.random((20, 2, 4))
+    span = Span(table)
+    assert span.rank == 4
+    assert span.same_span(table @ rng.random((4, 4)))
+    assert not span.same_span(rng.random((20, 2, 4)))
+    assert not span.same_span(table[:10])
+
+    deficient = table.copy()
+    deficient[:, :, 3] = deficient[:, :, 0] + deficient[:, :, 1]
+    span = Span(deficient)
+    assert span.rank == 3
+    assert not span.same_span(deficient)
+    assert span.same_span(deficient[:, :, [1, 0, 3, 2]], False)
+    assert not span.same_span(table, False)
+
+
+def test_span_sketch():
+    rng = np.random.default_rng(0)
+    table = rng.random((20, 2, 8))
+    span = Span(table)
+    assert not span.excludes(table @ rng.random((8, 8)))
+    assert span.same_span(table @ rng.random((8, 8)), sketch=True)
+
+    deficient = table.copy()
+    deficient[:, :, 7] = deficient[:, :, 0]
+    span = Span(deficient)
+    assert span.rank == 7
+    assert span.excludes(table)
+    assert not span.same_span(table, False, True)
+    assert not span.excludes(deficient[:, :, :7] @ rng.random((7, 8)))
+    assert span.same_span(deficient[:, :, :7] @ rng.random((7, 8)), False, True)
+
+
+def test_entity_tables():
+    calls = []
+
+    def tabulate(pts):
+        calls.append(pts.shape[0])
+        return np.stack([np.ones(pts.shape[0]), pts[:, 0], pts[:, 1]], axis=-1).reshape(-1, 1, 3)
+
+    info = VerificationInfo([[[0], [1], [2]], [[], [], []], [[]]], tabulate)
+    pts, slices = concatenated_entity_points("triangle")
+    for d, epoints_d in enumerate(entity_points("triangle")):
+        for e, epts in enumerate(epoints_d):
+            assert np.allclose(pts[slices[d][e]], epts)
+            table = info.exterior_table("triangle", d, e)
+            assert np.allclose(table, tabulate(epts)[:, :, info.exterior_dofs("triangle")[d][e]])
+    assert calls.count(pts.shape[0]) == 1
+    assert info.exterior_dofs("triangle")[1][0].tolist() == [2]
+
+
+def test_tabulator_eviction(monkeypatch):
+    monkeypatch.setattr(settings, "caching", False)
+    element = symfem.create_element("triangle", "Lagrange", 1)
+    tabulator = CachedSymfemTabulator(element, max_tables=2)
+    pts = [points("triangle")[i : i + 5] for i in range(3)]
+    tables = [tabulator.tabulate(p) for p in pts]
+    assert len(tabulator.tables) == 2
+    assert tabulator.tabulate(pts[2]) is tables[2]
+    assert tabulator.tabulate(pts[0]) is not tables[0]
+    assert np.allclose(tabulator.tabulate(pts[0]), tables[0])
+
+
+def test_compiled_basis(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "cache_path", str(tmp_path))
+    monkeypatch.setattr(settings, "caching", True)
+    element = symfem.create_element("triangle", "N1curl", 2)
+    pts = points("triangle")
+    symbolic = to_array(element.tabulate_basis(pts, "xx,yy,zz")).reshape(pts.shape[0], 2, -1)
+
+    take_statistics()
+    assert np.allclose(compile_basis(element, "key")(pts), symbolic)
+    assert np.allclose(compile_basis(element, "key")(pts), symbolic)
+    assert take_statistics()["symfem-basis"] == (1, 1)
+    get_backend().close()
+
+    assert compile_basis(symfem.create_element("triangle", "HCT", 3)) is None
+
+
+def test_compiled_basis_singular_points():
+    element = symfem.create_element("pyramid", "Lagrange", 1)
+    pts = np.array([[0.0, 0.0, 1.0], [0.2, 0.1, 0.5]])
+    symbolic = to_array(element.tabulate_basis(pts, "xx,yy,zz")).reshape(2, 1, -1)
+    assert np.allclose(compile_basis(element)(pts), symbolic)
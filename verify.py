@@ -1,110 +1,1779 @@
 """Perform verification checks."""
 
 import argparse
+import cProfile
 import json
 import os
+import queue
+import re
+import resource
+import signal
+import sys
+import threading
+import time
 import typing
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 
 from defelement import settings
+from defelement.caching import (
+    content_hash,
+    parse_size,
+    symfem_element_source_hash,
+    tidy_array_cache,
+    verification_source_hash,
+)
 from defelement.element import Categoriser, Element
-from defelement.implementations import parse_example, verifications, versions
-from defelement.verification import verify
+from defelement.implementations import (
+    parse_example,
+    verification_preparations,
+    verifications,
+    versions,
+)
+from defelement.implementations.symfem import array_key_prefix, verification_degree
+from defelement.verification import (
+    Span,
+    VerificationInfo,
+    grid_size,
+    grid_sizes,
+    tdims,
+    verify,
+)
+
+
+# The time in seconds spent in each phase of verifying each implementation, and the peak
+# memory used in bytes
+TaskTimings = dict[str, dict[str, float]]
+# The statuses that an example can be given, in the order they are written to the output
+statuses = ["pass", "fail", "not implemented", "timeout", "oom"]
+
+
+class VerificationTimeout(BaseException):
+    """Raised when verifying an example takes longer than the timeout.
+
+    This is not a subclass of Exception so that it is not caught by libraries that catch
+    all exceptions.
+    """
+
+
+class VerificationMemoryLimit(BaseException):
+    """Raised when verifying increases the memory used by a process by more than the limit."""
+
+
+# How often (in seconds) the time and memory limits are checked
+limit_check_interval = 0.1
+# The time at which the example currently being verified will time out
+_deadline: float | None = None
+# The resident set size of this process when it started verifying the current example. The
+# memory limit applies to the increase from this, so that memory held by earlier examples
+# (eg in caches) does not cause later examples to run out of memory
+_memory_baseline = 0
+
+
+def memory_usage() -> int | None:
+    """Get the resident set size of this process.
+
+    Returns:
+        The resident set size in bytes, or None if it cannot be found on this platform
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _check_limits(signum: int, frame: typing.Any):
+    """Check that the time and memory limits have not been exceeded.
+
+    Args:
+        signum: The signal number
+        frame: The current stack frame
+    """
+    if _deadline is not None and time.perf_counter() > _deadline:
+        raise VerificationTimeout()
+    if settings.verification_memory_limit is not None:
+        rss = memory_usage()
+        if rss is not None and rss - _memory_baseline > settings.verification_memory_limit:
+            raise VerificationMemoryLimit()
+
+
+def peak_memory(maxrss: int) -> int | None:
+    """Get the peak resident set size of this process since a point in time.
+
+    If the process reached a new maximum since that point, this is exact. Otherwise, the
+    current resident set size is returned as a lower bound.
+
+    Args:
+        maxrss: The maximum resident set size (as reported by getrusage) at that point
+
+    Returns:
+        The peak resident set size in bytes
+    """
+    new_maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if new_maxrss > maxrss:
+        return new_maxrss * 1024
+    return memory_usage()
+
+
+class PhaseTimer:
+    """Timer that records the time spent in each phase of verification.
+
+    Time spent in a phase that is nested inside another phase is only counted for the
+    inner phase.
+    """
+
+    def __init__(self):
+        """Create."""
+        self.times: dict[tuple[str, str], float] = {}
+        self._nested: list[float] = []
+
+    @contextmanager
+    def phase(self, implementation: str, name: str):
+        """Time a phase.
+
+        Args:
+            implementation: The implementation that the time is recorded for
+            name: The name of the phase
+        """
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            key = (implementation, name)
+            self.times[key] = self.times.get(key, 0.0) + elapsed - self._nested.pop()
+            if len(self._nested) > 0:
+                self._nested[-1] += elapsed
+
+    def timed(
+        self, implementation: str, name: str, f: typing.Callable[..., typing.Any]
+    ) -> typing.Callable[..., typing.Any]:
+        """Wrap a function so that time spent in it is recorded as a phase.
+
+        Args:
+            implementation: The implementation that the time is recorded for
+            name: The name of the phase
+            f: The function
+
+        Returns:
+            The wrapped function
+        """
+
+        def wrapped(*args, **kwargs):
+            with self.phase(implementation, name):
+                return f(*args, **kwargs)
+
+        return wrapped
+
+    def summary(self, implementation: str) -> dict[str, float]:
+        """Get the time spent in each phase for an implementation.
+
+        Args:
+            implementation: The implementation
+
+        Returns:
+            The time spent in each phase, and the total time
+        """
+        times = {name: t for (i, name), t in self.times.items() if i == implementation}
+        times["total"] = sum(times.values())
+        return times
+
+
+def profile_filename(e: Element, eg: str) -> str:
+    """Get the filename that profiling stats for an example are saved to.
+
+    Args:
+        e: The element
+        eg: The example
+
+    Returns:
+        The filename
+    """
+    assert settings.verification_profile_path is not None
+    name = re.sub(r"[^\w.-]", "_", eg)
+    return os.path.join(settings.verification_profile_path, f"{e.filename}-{name}.prof")
+
+
+def verify_implementation(
+    e: Element,
+    eg: str,
+    i: str,
+    sym_info: VerificationInfo,
+    n: int | None,
+    strict: bool = True,
+) -> tuple[str | None, dict[str, float]]:
+    """Verify an implementation of an example against Symfem.
+
+    Args:
+        e: The element
+        eg: The example
+        i: The implementation
+        sym_info: Verification information for the Symfem implementation of the example
+        n: The number of subdivisions along each axis of the tabulation grids
+        strict: Should a RuntimeError raised while creating the implementation be raised? If
+            not, the implementation is given the status "not implemented". This is used for
+            degree sweeps, which include examples that are not listed in the .def file and
+            that the implementation may not be able to create
+
+    Returns:
+        The status given to the implementation (or None if its library is not installed), and
+        the time in seconds spent in each phase of the verification and the peak memory use
+        in bytes
+    """
+    green = "\033[32m"
+    red = "\033[31m"
+    blue = "\033[34m"
+    default = "\033[0m"
+
+    timer = PhaseTimer()
+    cell = eg.split(",")[0]
+    reference, defelement_degree, variant, _ = parse_example(eg)
+    # Implementations generated from other implementations (eg Basix code generated by Symfem)
+    input_code = i[2:-1].split(" -> ")[0] if i.startswith("*(") and i.endswith(")") else i
+    check_limits = len(_servers) == 0 and (
+        settings.verification_timeout is not None or settings.verification_memory_limit is not None
+    )
+
+    status: str | None = None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        # The limits are no longer checked once the verification has finished, so that they
+        # cannot be raised while the result or an error is being handled
+        try:
+            if check_limits:
+                _check_limits(signal.SIGALRM, None)
+                signal.setitimer(signal.ITIMER_REAL, limit_check_interval, limit_check_interval)
+            with timer.phase(i, "construction"):
+                impl_name, impl_degree, impl_params = e.get_implementation_string(
+                    input_code,
+                    reference,
+                    defelement_degree,
+                    variant,
+                )
+                assert impl_degree is not None
+                try:
+                    entity_dofs, tabulate = verification_function(i)(
+                        impl_name, reference, impl_degree, impl_params, e, eg
+                    )
+                except RuntimeError as err:
+                    if strict:
+                        raise
+                    raise NotImplementedError(f"{type(err).__name__}: {err}") from err
+            with timer.phase(i, "linear algebra"):
+                v, info = verify(
+                    cell,
+                    (entity_dofs, timer.timed(i, "tabulation", tabulate)),
+                    sym_info,
+                    settings.verification_sketch,
+                    n,
+                )
+        finally:
+            if check_limits:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        if v:
+            status = "pass"
+            print(f"{e.filename} {i} {eg} {green}\u2713{default}")
+        else:
+            status = "fail"
+            print(f"{e.filename} {i} {eg} {red}\u2715{default}")
+            if print_reasons:
+                print(f"  {info}")
+    except ImportError as err:
+        if skip_missing:
+            print(f"{output_code(i)} not installed")
+        else:
+            raise err
+    except NotImplementedError:
+        status = "not implemented"
+        print(f"{e.filename} {i} {eg} {blue}\u2013{default}")
+    except VerificationTimeout:
+        status = "timeout"
+        print(f"{e.filename} {i} {eg} {red}timeout{default}")
+    except (MemoryError, VerificationMemoryLimit):
+        status = "oom"
+        print(f"{e.filename} {i} {eg} {red}out of memory{default}")
+    except (KeyboardInterrupt, RuntimeError) as err:
+        raise err
+    except BaseException as err:
+        status = "fail"
+        print(f"{e.filename} {i} {eg} {red}\u2715{default}")
+        if print_reasons:
+            print(f"  {type(err).__name__}: {err}")
+
+    timings = timer.summary(i)
+    memory = peak_memory(maxrss)
+    if memory is not None:
+        timings["memory"] = memory
+    return status, timings
+
+
+class VerificationServerError(Exception):
+    """Raised when a verification server process stops unexpectedly."""
+
+
+# How long (in seconds) after a task's timeout a verification server or worker process is
+# given to respond before it is killed
+grace_period = 5.0
+# The time at which the example being verified by each thread will time out, when
+# implementations are verified by servers
+_thread_state = threading.local()
+# The server used to verify each implementation, if servers are being used
+_servers: dict[str, "VerificationServer"] = {}
+
+
+def _serve(implementation: str, elements: dict[str, Element], conn: typing.Any, max_elements: int):
+    """Handle requests sent to a verification server process until its pipe is closed.
+
+    The constructed elements are keyed on the DefElement element, implementation string,
+    reference, degree and parameters, but not the example, so an element is shared by every
+    example that uses it. The element is included as implementations may depend on it (eg
+    FIAT handles some elements differently).
+
+    Args:
+        implementation: The implementation
+        elements: The elements, indexed by filename
+        conn: The server end of the pipe
+        max_elements: The number of constructed elements to keep
+    """
+    import pickle
+    from multiprocessing import shared_memory
+
+    import numpy as np
+
+    global _deadline, _memory_baseline
+    check_limits = (
+        settings.verification_timeout is not None or settings.verification_memory_limit is not None
+    )
+    if check_limits:
+        signal.signal(signal.SIGALRM, _check_limits)
+    constructed: OrderedDict[tuple[typing.Any, ...], typing.Any] = OrderedDict()
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        kind, name, reference, degree, params, filename, example, points, timeout = request
+        key = (filename, name, reference, degree, tuple(sorted(params.items())))
+        response: tuple[typing.Any, ...]
+        try:
+            # The limits are no longer checked once the request has been handled, so that the
+            # response is always sent
+            try:
+                if check_limits:
+                    _deadline = None if timeout is None else time.perf_counter() + timeout
+                    _memory_baseline = memory_usage() or 0
+                    _check_limits(signal.SIGALRM, None)
+                    signal.setitimer(signal.ITIMER_REAL, limit_check_interval, limit_check_interval)
+                if kind == "degree":
+                    # This is only used by the Symfem server, so that Symfem elements are not
+                    # created in the process that sends the requests
+                    response = ("degree", verification_degree(name, reference, degree, params))
+                elif key in constructed:
+                    constructed.move_to_end(key)
+                else:
+                    constructed[key] = verifications[implementation](
+                        name, reference, degree, params, elements[filename], example
+                    )
+                    while len(constructed) > max_elements:
+                        constructed.popitem(last=False)
+                if kind == "dofs":
+                    response = ("dofs", constructed[key][0])
+                elif kind == "table":
+                    table = np.asarray(constructed[key][1](points), dtype=np.float64)
+                    shm = shared_memory.SharedMemory(create=True, size=max(table.nbytes, 1))
+                    np.ndarray(table.shape, dtype=np.float64, buffer=shm.buf)[:] = table
+                    response = ("table", shm.name, table.shape)
+                    shm.close()
+            finally:
+                if check_limits:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+        except KeyboardInterrupt:
+            return
+        except BaseException as err:
+            try:
+                pickle.dumps(err)
+            except Exception:
+                err = VerificationServerError(f"{type(err).__name__}: {err}")
+            response = ("error", err)
+        conn.send(response)
+
+
+class VerificationServer:
+    """A pool of long-lived worker processes that verify one implementation.
+
+    Each worker keeps the elements it has constructed, so that they can be used for every
+    set of points that they are tabulated at, and evicts the least recently used element once
+    it has more than settings.verification_server_elements of them. Every request for the
+    same element is sent to the same worker, so that the element is only constructed once.
+    Tables are returned through shared memory. The time and memory limits are checked in the
+    workers, and a worker that does not respond after its timeout is killed and replaced.
+    """
+
+    def __init__(self, implementation: str, elements: dict[str, Element], processes: int):
+        """Start the worker processes.
+
+        Args:
+            implementation: The implementation
+            elements: The elements, indexed by filename
+            processes: The number of worker processes
+        """
+        self.implementation = implementation
+        self.elements = elements
+        self.workers = [self._start() for _ in range(processes)]
+        # Each worker handles one request at a time
+        self.locks = [threading.Lock() for _ in range(processes)]
+
+    def _start(self) -> tuple[typing.Any, typing.Any]:
+        """Start a worker process.
+
+        Returns:
+            The process and the client end of its pipe
+        """
+        import multiprocessing
+
+        context = multiprocessing.get_context("fork")
+        conn, server_conn = context.Pipe()
+        process = context.Process(
+            target=_serve,
+            args=(
+                self.implementation,
+                self.elements,
+                server_conn,
+                settings.verification_server_elements,
+            ),
+            daemon=True,
+        )
+        process.start()
+        server_conn.close()
+        return process, conn
+
+    def request(
+        self,
+        kind: str,
+        name: str,
+        reference: str,
+        degree: int,
+        params: dict[str, str],
+        element: Element,
+        example: str | None = None,
+        points: typing.Any = None,
+    ) -> typing.Any:
+        """Send a request to the worker process that handles an element.
+
+        Args:
+            kind: The kind of request: "dofs" to get the entity DOFs, "table" to tabulate the
+                basis functions, or "degree" to get the Symfem verification degree
+            name: Implementation string as set in the .def file
+            reference: The name of the reference cell
+            degree: The degree of this example
+            params: Additional parameters set in the .def file
+            element: The DefElement element object
+            example: Raw example data
+            points: The points to tabulate at
+
+        Returns:
+            The entity DOFs, the table or the verification degree
+        """
+        from multiprocessing import shared_memory
+
+        import numpy as np
+
+        deadline = getattr(_thread_state, "deadline", None)
+        timeout = None if deadline is None else max(deadline - time.perf_counter(), 0.0)
+        filename = element.filename
+        worker = int(content_hash(filename, name, reference, degree, params), 16) % len(
+            self.workers
+        )
+        with self.locks[worker]:
+            process, conn = self.workers[worker]
+            try:
+                conn.send(
+                    (kind, name, reference, degree, params, filename, example, points, timeout)
+                )
+                if not conn.poll(None if timeout is None else timeout + grace_period):
+                    raise VerificationTimeout()
+                response = conn.recv()
+            except (VerificationTimeout, EOFError, OSError) as err:
+                process.kill()
+                process.join()
+                conn.close()
+                self.workers[worker] = self._start()
+                if isinstance(err, VerificationTimeout):
+                    raise err
+                raise VerificationServerError(
+                    f"The {self.implementation} server stopped unexpectedly"
+                ) from err
+
+        if response[0] == "error":
+            raise response[1]
+        if response[0] in ["dofs", "degree"]:
+            return response[1]
+        _, shm_name, shape = response
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            return np.ndarray(shape, dtype=np.float64, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def verify(
+        self,
+        name: str,
+        reference: str,
+        degree: int,
+        params: dict[str, str],
+        element: Element,
+        example: str,
+    ) -> tuple[list[list[list[int]]], typing.Callable[[typing.Any], typing.Any]]:
+        """Get verification data from the server.
+
+        This takes the same inputs and returns the same outputs as Implementation.verify.
+
+        Args:
+            name: Implementation string as set in the .def file
+            reference: The name of the reference cell
+            degree: The degree of this example
+            params: Additional parameters set in the .def file
+            element: The DefElement element object
+            example: Raw example data
+
+        Returns:
+            The DOFs associated with each sub-entity, and a function that tabulates the basis
+            functions
+        """
+        entity_dofs = self.request("dofs", name, reference, degree, params, element, example)
+        return entity_dofs, lambda points: self.request(
+            "table", name, reference, degree, params, element, example, points
+        )
+
+    def close(self):
+        """Stop the worker processes."""
+        for process, conn in self.workers:
+            conn.send(None)
+            conn.close()
+            process.join()
+        self.workers = []
+
+
+def start_servers(implementations: list[str], elements: list[Element]):
+    """Start a verification server for each implementation.
+
+    The servers are started by forking this process, so this should be called after the
+    libraries have been imported and before any threads are started.
+
+    Args:
+        implementations: The implementations
+        elements: The elements
+    """
+    from multiprocessing import resource_tracker
+
+    assert settings.verification_server_processes is not None
+    # The servers and this process must share a resource tracker, as shared memory is
+    # created by the servers and unlinked by this process
+    resource_tracker.ensure_running()
+    by_filename = {e.filename: e for e in elements}
+    for i in implementations:
+        if i not in _servers:
+            _servers[i] = VerificationServer(i, by_filename, settings.verification_server_processes)
+
+
+def stop_servers():
+    """Stop the verification servers."""
+    for server in _servers.values():
+        server.close()
+    _servers.clear()
+
+
+def verification_function(
+    implementation: str,
+) -> typing.Callable[..., tuple[list[list[list[int]]], typing.Callable[[typing.Any], typing.Any]]]:
+    """Get the function that gets verification data for an implementation.
+
+    Args:
+        implementation: The implementation
+
+    Returns:
+        The verify method of the implementation's server if servers are being used, otherwise
+        the implementation's verify method
+    """
+    if implementation in _servers:
+        return _servers[implementation].verify
+    return verifications[implementation]
+
+
+def symfem_verification_degree(
+    name: str, reference: str, degree: int, params: dict[str, str], element: Element
+) -> int | None:
+    """Get the degree of the Lagrange space that a Symfem element is contained in.
+
+    If servers are being used, the Symfem element is created by the Symfem server rather than
+    in this process.
+
+    Args:
+        name: The name of the element in Symfem
+        reference: The name of the reference cell
+        degree: The degree of the element in Symfem
+        params: Additional parameters
+        element: The DefElement element object
+
+    Returns:
+        The degree, or None if the element is not contained in a polynomial Lagrange space
+    """
+    if "symfem" in _servers:
+        return _servers["symfem"].request("degree", name, reference, degree, params, element)
+    return verification_degree(name, reference, degree, params)
+
+
+def _initial_results(
+    e: Element, eg: str, implementations: list[str], previous: dict[str, str]
+) -> tuple[dict[str, dict[str, dict[str, list[str]]]], list[str]]:
+    """Create the results for an example before any implementations are verified.
+
+    Args:
+        e: The element
+        eg: The example
+        implementations: The implementations
+        previous: Previous results that should be reused
+
+    Returns:
+        The results, including the previous results, and the implementations that need to be
+        verified
+    """
+    results: dict[str, dict[str, dict[str, list[str]]]] = {e.filename: {}}
+    to_verify = []
+    for i in implementations:
+        # Implementations generated from other implementations (eg Basix code generated by Symfem)
+        if i.startswith("*(") and i.endswith(")"):
+            input_code = i[2:-1].split(" -> ")[0]
+            if e.implemented(output_code(i)) or not e.implemented(input_code):
+                continue
+
+        if output_code(i) not in results[e.filename]:
+            results[e.filename][output_code(i)] = {status: [] for status in statuses}
+
+        # Reuse previous result
+        if i in previous:
+            results[e.filename][output_code(i)][previous[i]].append(eg)
+        else:
+            to_verify.append(i)
+    return results, to_verify
+
+
+def _set_limits():
+    """Set the time and memory limits for verifying an example in this thread or process."""
+    global _deadline, _memory_baseline
+    deadline = None
+    if settings.verification_timeout is not None:
+        deadline = time.perf_counter() + settings.verification_timeout
+    # When servers are used, the limits are checked by the servers
+    if len(_servers) > 0:
+        _thread_state.deadline = deadline
+    else:
+        _deadline = deadline
+        _memory_baseline = memory_usage() or 0
+        if (
+            settings.verification_timeout is not None
+            or settings.verification_memory_limit is not None
+        ):
+            signal.signal(signal.SIGALRM, _check_limits)
+
+
+def _symfem_implementation(e: Element, eg: str) -> tuple[str, str, int, dict[str, str]]:
+    """Get the Symfem implementation of an example.
+
+    Args:
+        e: The element
+        eg: The example
+
+    Returns:
+        The name of the element in Symfem, the reference cell, the degree of the element in
+        Symfem, and additional parameters
+    """
+    reference, defelement_degree, variant, kwargs = parse_example(eg)
+    assert len(kwargs) == 0
+    symfem_name, symfem_degree, symfem_params = e.get_implementation_string(
+        "symfem",
+        reference,
+        defelement_degree,
+        variant,
+    )
+    assert symfem_degree is not None
+    return symfem_name, reference, symfem_degree, symfem_params
+
+
+def _symfem_info(
+    e: Element, eg: str, timer: PhaseTimer
+) -> tuple[VerificationInfo, int | None, int | None]:
+    """Create the Symfem implementation of an example.
+
+    Args:
+        e: The element
+        eg: The example
+        timer: The timer that the time spent constructing and tabulating Symfem is recorded in
+
+    Returns:
+        Verification information for the Symfem implementation, the number of subdivisions
+        along each axis of the tabulation grids, and the peak memory use in bytes during
+        construction
+    """
+    symfem_name, reference, symfem_degree, symfem_params = _symfem_implementation(e, eg)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with timer.phase("symfem", "construction"):
+        sym_entity_dofs, sym_tabulate = verification_function("symfem")(
+            symfem_name, reference, symfem_degree, symfem_params, e, eg
+        )
+    sym_info = VerificationInfo(sym_entity_dofs, timer.timed("symfem", "tabulation", sym_tabulate))
+    symfem_memory = peak_memory(maxrss)
+    # The size of the tabulation grids is chosen using the Symfem element
+    n = None
+    if settings.verification_oversampling is not None:
+        n = grid_size(
+            eg.split(",")[0],
+            symfem_verification_degree(symfem_name, reference, symfem_degree, symfem_params, e),
+            sum(len(dofs) for row in sym_entity_dofs for dofs in row),
+            settings.verification_oversampling,
+        )
+    return sym_info, n, symfem_memory
+
+
+# The Symfem entity DOFs, the number of subdivisions along each axis of the tabulation grids,
+# and the span and entity table of the Symfem element, as computed by symfem_verification_data
+SymfemData = tuple[list[list[list[int]]], int | None, Span, typing.Any]
+
+
+def symfem_verification_data(
+    element: tuple[Element, str],
+) -> tuple[SymfemData | str, TaskTimings]:
+    """Compute the Symfem data needed to verify the implementations of an example.
+
+    Args:
+        element: The element and example
+
+    Returns:
+        The Symfem data (or the status to give every implementation if the time or memory
+        limit is reached), and the time in seconds spent in each phase and the peak memory use
+        in bytes
+    """
+    e, eg = element
+    _set_limits()
+    timer = PhaseTimer()
+    cell = eg.split(",")[0]
+    check_limits = len(_servers) == 0 and (
+        settings.verification_timeout is not None or settings.verification_memory_limit is not None
+    )
+
+    data: SymfemData | str
+    symfem_memory = None
+    try:
+        try:
+            if check_limits:
+                signal.setitimer(signal.ITIMER_REAL, limit_check_interval, limit_check_interval)
+            sym_info, n, symfem_memory = _symfem_info(e, eg, timer)
+            data = (sym_info.entity_dofs, n, sym_info.span(cell, n), sym_info.entity_table(cell, n))
+        finally:
+            if check_limits:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except VerificationTimeout:
+        data = "timeout"
+    except (MemoryError, VerificationMemoryLimit):
+        data = "oom"
+
+    timings = {"symfem": timer.summary("symfem")}
+    if symfem_memory is not None:
+        timings["symfem"]["memory"] = symfem_memory
+    return data, timings
 
 
 def verify_example(
-    element: tuple[Element, str, list[str]],
+    element: tuple[Element, str, list[str], dict[str, str]],
+    symfem_data: SymfemData | None = None,
+    strict: bool = True,
+) -> tuple[dict[str, dict[str, dict[str, list[str]]]], TaskTimings]:
+    """Verify example.
+
+    If verification servers have been started, the libraries are run in the servers and this
+    can be run in several threads.
+
+    Args:
+        element: The element, example, list of implementations, and previous results that
+            should be reused for implementations that do not need to be verified again
+        symfem_data: The Symfem data computed by symfem_verification_data. If this is given,
+            the Symfem element is not created and no timings are recorded for Symfem
+        strict: Should errors raised while creating an implementation be raised? This is
+            passed to verify_implementation
+
+    Returns:
+        Results of verification, and timings for each implementation. The timings include
+        the time in seconds spent in each phase of the verification and the peak memory use
+        in bytes. If the verification timeout is reached, the implementation being verified and all
+        the implementations that have not yet been verified are given the status "timeout".
+        Implementations that take the process over the memory limit are given the status
+        "oom".
+    """
+    e, eg, implementations, previous = element
+
+    timer = PhaseTimer()
+    timings: TaskTimings = {}
+    start = time.perf_counter()
+    profiler = None
+    if settings.verification_profile_path is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    _set_limits()
+
+    results, to_verify = _initial_results(e, eg, implementations, previous)
+
+    # The Symfem closure DOFs are computed once and reused for every implementation
+    symfem_memory = None
+    if symfem_data is None:
+        sym_info, n, symfem_memory = _symfem_info(e, eg, timer)
+    else:
+        sym_entity_dofs, n, span, entity_table = symfem_data
+
+        def sym_tabulate(points: typing.Any) -> typing.Any:
+            """Tabulate the Symfem element at points that were not included in the data."""
+            symfem_name, reference, symfem_degree, symfem_params = _symfem_implementation(e, eg)
+            return verification_function("symfem")(
+                symfem_name, reference, symfem_degree, symfem_params, e, eg
+            )[1](points)
+
+        sym_info = VerificationInfo(sym_entity_dofs, sym_tabulate)
+        sym_info.add_tables(eg.split(",")[0], n, span, entity_table)
+
+    for i in to_verify:
+        status, implementation_timings = verify_implementation(e, eg, i, sym_info, n, strict)
+        if status is not None:
+            results[e.filename][output_code(i)][status].append(eg)
+        timings[i] = implementation_timings
+
+    # The Symfem tables are tabulated when they are first needed to verify an implementation,
+    # so the Symfem timings are recorded after every implementation has been verified
+    if symfem_data is None:
+        timings["symfem"] = timer.summary("symfem")
+        if symfem_memory is not None:
+            timings["symfem"]["memory"] = symfem_memory
+
+    if profiler is not None:
+        profiler.disable()
+        if time.perf_counter() - start > settings.verification_profile_threshold:
+            profiler.dump_stats(profile_filename(e, eg))
+
+    return results, timings
+
+
+def timed_out_example(
+    element: tuple[Element, str, list[str], dict[str, str]],
+    status: str = "timeout",
+) -> tuple[dict[str, dict[str, dict[str, list[str]]]], TaskTimings]:
+    """Create the results for an example whose worker process was killed after timing out.
+
+    Args:
+        element: The element, example, list of implementations, and previous results
+        status: The status to give the implementations. This is "oom" if the Symfem data for
+            the example could not be computed within the memory limit
+
+    Returns:
+        Results in which every implementation that was being verified has the given status,
+        and timings recording the timeout as the time taken by each of them if they timed out
+    """
+    e, eg, implementations, previous = element
+    results, to_verify = _initial_results(e, eg, implementations, previous)
+    timings: TaskTimings = {}
+    for i in to_verify:
+        results[e.filename][output_code(i)][status].append(eg)
+        if status == "timeout" and settings.verification_timeout is not None:
+            timings[i] = {"total": settings.verification_timeout}
+    return results, timings
+
+
+def _run_example_part(part: tuple[str, typing.Any]) -> typing.Any:
+    """Run a part of the verification of an example.
+
+    Args:
+        part: The kind of part ("symfem" or "implementation") and its task. The task for a
+            "symfem" part is the element and example; the task for an "implementation" part
+            is the task for verify_example followed by the Symfem data
+
+    Returns:
+        The result of symfem_verification_data or verify_example
+    """
+    kind, task = part
+    if kind == "symfem":
+        return symfem_verification_data(task)
+    return verify_example(task[:4], task[4])
+
+
+def _timed_out_example_part(part: tuple[str, typing.Any]) -> typing.Any:
+    """Create the result for a part of the verification of an example that timed out.
+
+    Args:
+        part: The kind of part and its task, as passed to _run_example_part
+
+    Returns:
+        The result that is used in place of the result of _run_example_part
+    """
+    kind, task = part
+    if kind == "symfem":
+        return "timeout", {}
+    return timed_out_example(task[:4])
+
+
+def warm_up(implementations: list[str]) -> list[str]:
+    """Import the libraries needed to verify implementations.
+
+    This is run before any worker processes are created, so that each worker does not need
+    to import every library again. If an implementation cannot be imported, an error is
+    raised unless missing libraries are being skipped.
+
+    Args:
+        implementations: The implementations
+
+    Returns:
+        The implementations that could not be imported
+    """
+    start = time.perf_counter()
+    failures = {}
+    for i in implementations:
+        try:
+            verification_preparations[i]()
+        except ImportError as err:
+            failures[i] = f"{type(err).__name__}: {err}"
+    imported = len(implementations) - len(failures)
+    print(f"Imported {imported} libraries in {time.perf_counter() - start:.2f}s")
+    for i, message in failures.items():
+        if i == "symfem" or not skip_missing:
+            raise ImportError(f"Could not import {i}: {message}")
+        print(f"{i} not installed ({message})")
+    return list(failures)
+
+
+def output_code(implementation: str) -> str:
+    """Get the implementation that verification results are recorded for.
+
+    Args:
+        implementation: The implementation
+
+    Returns:
+        The implementation that results are recorded for
+    """
+    if implementation.startswith("*(") and implementation.endswith(")"):
+        return implementation[2:-1].split(" -> ")[1]
+    return implementation
+
+
+def verification_status(
+    data: dict[str, dict[str, dict[str, list[str]]]], filename: str, implementation: str, eg: str
+) -> str | None:
+    """Find the status of an example in verification results.
+
+    Args:
+        data: Verification results
+        filename: The filename of the element
+        implementation: The implementation
+        eg: The example
+
+    Returns:
+        The status, or None if the example is not included in the results
+    """
+    for status, examples in data.get(filename, {}).get(output_code(implementation), {}).items():
+        if eg in examples:
+            return status
+    return None
+
+
+def estimate_cost(
+    task: tuple[Element, str, list[str], dict[str, str]],
+    timings: dict[str, dict[str, TaskTimings]],
+) -> float:
+    """Estimate the time it will take to verify an example.
+
+    Timings recorded in previous runs are used if they are available for every
+    implementation that will be verified. Otherwise, a rough estimate based on the number of
+    DOFs of the element is used.
+
+    Args:
+        task: The element, example, list of implementations, and previous results
+        timings: Timings recorded in previous runs
+
+    Returns:
+        The estimated cost
+    """
+    e, eg, implementations, previous = task
+    to_verify = [i for i in implementations if i not in previous]
+    recorded = timings.get(e.filename, {}).get(eg, {})
+    if all(i in recorded for i in to_verify):
+        return sum(recorded[i]["total"] for i in {*to_verify, "symfem"} if i in recorded)
+
+    reference, degree, _, _ = parse_example(eg)
+    ndofs = e.dof_count(reference, degree)
+    if ndofs is None:
+        # The number of DOFs of a scalar element grows like degree ** tdim
+        ndofs = (degree + 2) ** tdims.get(reference, 2)
+    # The cost of comparing the spans grows like the square of the number of DOFs
+    return len(to_verify) * float(ndofs) ** 2
+
+
+def run_tasks(
+    tasks: list[typing.Any],
+    costs: list[float],
+    function: typing.Callable[[typing.Any], typing.Any] = verify_example,
+    time_limits: list[float] | None = None,
+    timed_out: typing.Callable[[typing.Any], typing.Any] = timed_out_example,
+    cheapest_first: bool = False,
+    follow_up: typing.Callable[[int, typing.Any], list[tuple[typing.Any, float, float | None]]]
+    | None = None,
+) -> typing.Iterator[tuple[int, typing.Any]]:
+    """Verify examples, yielding each result as soon as it is available.
+
+    When running in parallel, the most expensive tasks are started first (unless
+    cheapest_first is set), and each worker is given one task at a time, so that expensive
+    tasks do not all end up on the same worker. If verification servers have been started,
+    the workers are threads in this process, as the libraries are run in the servers.
+
+    The time limits are checked inside the workers, but a library that is stuck in compiled
+    code cannot be interrupted there. If time limits are given, this process also checks them,
+    and if a task runs for longer than its limit plus a grace period, the worker processes
+    are killed and restarted, the task is given the result returned by timed_out, and the
+    other tasks that were running are started again.
+
+    If follow_up is given, it is called with the position and result of each task when it
+    finishes, and the tasks it returns (with their costs and time limits) are started before
+    any of the tasks that are waiting. Their positions follow on from the positions of the
+    tasks that have already been added.
+
+    Args:
+        tasks: The tasks
+        costs: The estimated cost of each task
+        function: The function that runs a task
+        time_limits: The maximum time in seconds that each task should take
+        timed_out: The function that creates the result for a task that did not finish in time
+        cheapest_first: Should the cheapest tasks be started first?
+        follow_up: The function that creates the tasks to run after each task finishes
+
+    Returns:
+        The position of each task and the result of running it, in the order that the tasks
+        finish
+    """
+    tasks = list(tasks)
+    costs = list(costs)
+    limits: list[float | None] = [None for _ in tasks] if time_limits is None else list(time_limits)
+
+    def add_follow_ups(n: int, result: typing.Any) -> list[int]:
+        """Add the tasks that follow a task.
+
+        Args:
+            n: The position of the task
+            result: The result of the task
+
+        Returns:
+            The positions of the tasks that were added
+        """
+        if follow_up is None:
+            return []
+        start = len(tasks)
+        for task, cost, limit in follow_up(n, result):
+            tasks.append(task)
+            costs.append(cost)
+            limits.append(limit)
+        return list(range(start, len(tasks)))
+
+    def priority(n: int) -> float:
+        """Get the priority of a task: tasks with a higher priority are started first.
+
+        Args:
+            n: The position of the task
+
+        Returns:
+            The priority
+        """
+        return -costs[n] if cheapest_first else costs[n]
+
+    if settings.processes == 1:
+        n = 0
+        while n < len(tasks):
+            result = function(tasks[n])
+            add_follow_ups(n, result)
+            yield n, result
+            n += 1
+        return
+
+    import multiprocessing
+    from multiprocessing.pool import ThreadPool
+
+    order = sorted(range(len(tasks)), key=priority, reverse=True)
+    if follow_up is None and (len(_servers) > 0 or time_limits is None):
+        pool = (
+            ThreadPool(settings.processes)
+            if len(_servers) > 0
+            else multiprocessing.Pool(
+                settings.processes,
+                maxtasksperchild=settings.verification_max_tasks_per_child,
+            )
+        )
+        with pool as p:
+            yield from p.imap_unordered(
+                _run_task, [(n, function, tasks[n]) for n in order], chunksize=1
+            )
+        return
+
+    # Tasks are started from the end of this list
+    waiting = order[::-1]
+    while len(waiting) > 0:
+        # Results from each pool are sent to a new queue, so that nothing is received from
+        # the workers of a pool that has been killed
+        finished: queue.Queue = queue.Queue()
+        running: dict[int, float] = {}
+        with (
+            ThreadPool(settings.processes)
+            if len(_servers) > 0
+            else multiprocessing.Pool(
+                settings.processes, maxtasksperchild=settings.verification_max_tasks_per_child
+            )
+        ) as p:
+            while len(waiting) > 0 or len(running) > 0:
+                while len(waiting) > 0 and len(running) < settings.processes:
+                    n = waiting.pop()
+                    limit = limits[n]
+                    # Threads cannot be killed, and the servers check their own time limits
+                    running[n] = (
+                        float("inf")
+                        if limit is None or len(_servers) > 0
+                        else time.perf_counter() + limit + grace_period
+                    )
+                    p.apply_async(
+                        _run_task,
+                        ((n, function, tasks[n]),),
+                        callback=finished.put,
+                        error_callback=finished.put,
+                    )
+                next_deadline = min(running.values())
+                try:
+                    result = finished.get(
+                        timeout=None
+                        if next_deadline == float("inf")
+                        else max(0.0, next_deadline - time.perf_counter())
+                    )
+                except queue.Empty:
+                    now = time.perf_counter()
+                    for n in [n for n, deadline in running.items() if deadline <= now]:
+                        del running[n]
+                        print(f"Killing workers: task {n} did not finish in time")
+                        result = timed_out(tasks[n])
+                        waiting += sorted(add_follow_ups(n, result), key=priority)
+                        tasks[n] = None
+                        yield n, result
+                    # Leaving the with block terminates the workers
+                    waiting += sorted(running, key=priority)
+                    break
+                if isinstance(result, BaseException):
+                    raise result
+                n = result[0]
+                del running[n]
+                waiting += sorted(add_follow_ups(n, result[1]), key=priority)
+                # The task is no longer needed, and may contain large arrays
+                tasks[n] = None
+                yield result
+
+
+def run_examples(
+    tasks: list[tuple[Element, str, list[str], dict[str, str]]],
+    timings: dict[str, dict[str, TaskTimings]],
+) -> typing.Iterator[tuple[int, tuple[dict[str, dict[str, dict[str, list[str]]]], TaskTimings]]]:
+    """Verify examples, yielding the results for each example as soon as it is available.
+
+    If settings.verification_parallel_implementations is set, each implementation of each
+    example is verified as a separate task by run_tasks, so that the time taken to verify an
+    expensive example is bounded by its slowest implementation rather than the sum of their
+    times. The Symfem element for each example is created and tabulated once, by a task that
+    is run before the implementations are verified, and its tables are sent to the tasks that
+    verify the implementations.
+
+    Args:
+        tasks: The element, example, list of implementations, and previous results for each
+            example
+        timings: Timings recorded in previous runs
+
+    Returns:
+        The position of each example and the result of verify_example for it, in the order
+        that the examples finish
+    """
+    results: list[tuple[dict[str, dict[str, dict[str, list[str]]]], TaskTimings]] = []
+    remaining = []
+    for e, eg, implementations, previous in tasks:
+        example_results, to_verify = _initial_results(e, eg, implementations, previous)
+        results.append((example_results, {}))
+        remaining.append(len(to_verify))
+    # Examples whose previous results are all reused are not sent to the workers, so that the
+    # Symfem element is not created for them
+    for n, r in enumerate(remaining):
+        if r == 0:
+            yield n, results[n]
+
+    if not settings.verification_parallel_implementations:
+        to_run = [n for n, r in enumerate(remaining) if r > 0]
+        for m, r in run_tasks(
+            [tasks[n] for n in to_run],
+            [estimate_cost(tasks[n], timings) for n in to_run],
+            time_limits=None
+            if settings.verification_timeout is None
+            else [settings.verification_timeout for _ in to_run],
+        ):
+            yield to_run[m], r
+        return
+
+    # The Symfem data for each example is computed by one task, and then each implementation
+    # of the example is verified by a separate task that is given the data
+    limit = settings.verification_timeout
+    kinds = []
+    owners = []
+    parts: list[tuple[str, typing.Any]] = []
+    costs = []
+    for n, (e, eg, implementations, previous) in enumerate(tasks):
+        if remaining[n] > 0:
+            kinds.append("symfem")
+            owners.append(n)
+            parts.append(("symfem", (e, eg)))
+            costs.append(estimate_cost((e, eg, ["symfem"], {}), timings))
+
+    def follow_up(m: int, result: typing.Any) -> list[tuple[typing.Any, float, float | None]]:
+        """Create the tasks that verify the implementations of an example.
+
+        Args:
+            m: The position of the task that finished
+            result: The result of the task
+
+        Returns:
+            The tasks, their costs and their time limits
+        """
+        data = result[0]
+        if kinds[m] != "symfem" or isinstance(data, str):
+            return []
+        n = owners[m]
+        e, eg, implementations, previous = tasks[n]
+        new_parts: list[tuple[typing.Any, float, float | None]] = []
+        for i in _initial_results(e, eg, implementations, previous)[1]:
+            kinds.append("implementation")
+            owners.append(n)
+            new_parts.append(
+                (
+                    ("implementation", (e, eg, [i], {}, data)),
+                    estimate_cost((e, eg, [i], {}), timings),
+                    limit,
+                )
+            )
+        return new_parts
+
+    for m, (part_results, part_timings) in run_tasks(
+        parts,
+        costs,
+        _run_example_part,
+        None if limit is None else [limit for _ in parts],
+        _timed_out_example_part,
+        follow_up=follow_up,
+    ):
+        n = owners[m]
+        if kinds[m] == "symfem":
+            if isinstance(part_results, str):
+                # Every implementation is given the status that Symfem was given
+                failed_results, failed_timings = timed_out_example(tasks[n], part_results)
+                results[n] = (failed_results, {**part_timings, **failed_timings})
+                remaining[n] = 0
+                yield n, results[n]
+            else:
+                results[n] = (results[n][0], {**results[n][1], **part_timings})
+            continue
+        results[n] = (
+            combine_results([results[n][0], part_results]),
+            {**results[n][1], **part_timings},
+        )
+        remaining[n] -= 1
+        if remaining[n] == 0:
+            yield n, results[n]
+
+
+def degree_sweeps(
+    e: Element, degrees: range, implementations: list[str]
+) -> list[tuple[Element, list[str], list[str]]]:
+    """Create degree sweeps for an element.
+
+    A sweep is created for each cell and variant used in the element's examples. Each sweep
+    contains an example for every degree in the range that is supported by the element and
+    by Symfem, in increasing order.
+
+    Args:
+        e: The element
+        degrees: The degrees
+        implementations: The implementations to verify
+
+    Returns:
+        The element, examples and implementations to verify for each sweep
+    """
+    implementations = [i for i in implementations if e.implemented(i)]
+    if len(implementations) == 0:
+        return []
+
+    families: list[tuple[str, str | None]] = []
+    for eg in e.examples:
+        reference, _, variant, kwargs = parse_example(eg)
+        if len(kwargs) == 0 and (reference, variant) not in families:
+            families.append((reference, variant))
+
+    sweeps = []
+    for reference, variant in families:
+        max_degree = e.max_degree(reference)
+        examples = []
+        for degree in degrees:
+            if degree < e.min_degree(reference) or (max_degree is not None and degree > max_degree):
+                continue
+            try:
+                e.get_implementation_string("symfem", reference, degree, variant)
+            except NotImplementedError:
+                continue
+            examples.append(
+                f"{reference},{degree}" if variant is None else f"{reference},{degree},{variant}"
+            )
+        if len(examples) > 0:
+            sweeps.append((e, examples, implementations))
+    return sweeps
+
+
+def verify_sweep(
+    sweep: tuple[Element, list[str], list[str]],
+) -> tuple[dict[str, dict[str, dict[str, list[str]]]], dict[str, TaskTimings]]:
+    """Verify the examples in a degree sweep in order of increasing degree.
+
+    Once an implementation has failed, timed out or run out of memory, it is not verified at
+    higher degrees. The examples in a sweep are not listed in the element's .def file, so an
+    implementation that cannot be created for an example is given the status
+    "not implemented" rather than stopping the verification.
+
+    Args:
+        sweep: The element, examples and implementations to verify
+
+    Returns:
+        Results of verification, and the timings for each example
+    """
+    e, examples, implementations = sweep
+    results = []
+    timings = {}
+    for eg in examples:
+        if len(implementations) == 0:
+            break
+        r, timings[eg] = verify_example((e, eg, implementations, {}), strict=False)
+        results.append(r)
+        implementations = [
+            i
+            for i in implementations
+            if verification_status(r, e.filename, i, eg) not in ["fail", "timeout", "oom"]
+        ]
+    return combine_results(results), timings
+
+
+def timed_out_sweep(
+    sweep: tuple[Element, list[str], list[str]],
+) -> tuple[dict[str, dict[str, dict[str, list[str]]]], dict[str, TaskTimings]]:
+    """Create the results for a degree sweep whose worker process was killed after timing out.
+
+    As it is not known which examples were verified before the worker was killed, every
+    example in the sweep is given the status "timeout".
+
+    Args:
+        sweep: The element, examples and implementations to verify
+
+    Returns:
+        Results of verification, and the timings for each example
+    """
+    e, examples, implementations = sweep
+    results = [timed_out_example((e, eg, implementations, {})) for eg in examples]
+    return (
+        combine_results([r for r, _ in results]),
+        {eg: t for eg, (_, t) in zip(examples, results)},
+    )
+
+
+def checkpoint_entry(
+    task: tuple[Element, str, list[str], dict[str, str]],
+    result: tuple[dict[str, dict[str, dict[str, list[str]]]], TaskTimings],
+) -> dict[str, typing.Any]:
+    """Create the checkpoint entry for a verified example.
+
+    Args:
+        task: The element, example, list of implementations, and previous results
+        result: The result of verify_example for the task
+
+    Returns:
+        The checkpoint entry
+    """
+    e, eg, implementations, previous = task
+    return {
+        "element": e.filename,
+        "example": eg,
+        "implementations": implementations,
+        "previous": previous,
+        "results": result[0],
+        "timings": result[1],
+    }
+
+
+def load_checkpoint(filename: str) -> tuple[dict[str, typing.Any], list[dict[str, typing.Any]]]:
+    """Load a verification checkpoint.
+
+    The first line of a checkpoint is a header and each following line is an entry created
+    by checkpoint_entry. If the run that wrote the checkpoint was interrupted while writing
+    an entry, the incomplete entry is ignored.
+
+    Args:
+        filename: The filename of the checkpoint
+
+    Returns:
+        The header and the entries
+    """
+    with open(filename) as f:
+        lines = f.readlines()
+    header = json.loads(lines[0])
+    entries = []
+    for line in lines[1:]:
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            break
+    return header, entries
+
+
+def shard_tasks(
+    tasks: list[tuple[Element, str, list[str], dict[str, str]]],
+    timings: dict[str, dict[str, TaskTimings]],
+    shard: int,
+    shards: int,
+) -> list[int]:
+    """Find the tasks that should be verified by one shard.
+
+    Tasks are assigned greedily in order of decreasing estimated cost to the shard with
+    the smallest total cost so far. Ties are broken by position, so every shard computes the
+    same assignment if it is given the same tasks and timings.
+
+    Args:
+        tasks: The examples to verify
+        timings: Timings recorded in previous runs
+        shard: The shard (from 1 to shards)
+        shards: The number of shards
+
+    Returns:
+        The positions of the tasks that should be verified by the shard
+    """
+    costs = [estimate_cost(task, timings) for task in tasks]
+    loads = [0.0 for _ in range(shards)]
+    owners = [0 for _ in tasks]
+    for n in sorted(range(len(tasks)), key=lambda n: (-costs[n], n)):
+        owner = min(range(shards), key=lambda s: (loads[s], s))
+        owners[n] = owner
+        loads[owner] += costs[n]
+    return [n for n, owner in enumerate(owners) if owner == shard - 1]
+
+
+def combine_results(
+    results: list[dict[str, dict[str, dict[str, list[str]]]]],
 ) -> dict[str, dict[str, dict[str, list[str]]]]:
-    """Verify example.
+    """Combine verification results.
 
     Args:
-        element: The element, example and list of implementations
+        results: Verification results
 
     Returns:
-        Results of verification
+        The combined results
     """
-    e, eg, implementations = element
+    data: dict[str, dict[str, dict[str, list[str]]]] = {}
+    for r in results:
+        for i0, j0 in r.items():
+            if i0 not in data:
+                data[i0] = {}
+            for i1, j1 in j0.items():
+                if i1 not in data[i0]:
+                    data[i0][i1] = {}
+                for i2, j2 in j1.items():
+                    if i2 not in data[i0][i1]:
+                        data[i0][i1][i2] = []
+                    data[i0][i1][i2] += j2
+    return data
 
-    green = "\033[32m"
-    red = "\033[31m"
-    blue = "\033[34m"
-    default = "\033[0m"
 
-    results: dict[str, dict[str, dict[str, list[str]]]] = {}
+def sort_results(
+    data: dict[str, dict[str, dict[str, list[str]]]], categoriser: Categoriser
+) -> dict[str, dict[str, dict[str, list[str]]]]:
+    """Put verification results in the order that a run verifying all examples writes them.
 
-    if e.filename not in results:
-        results[e.filename] = {}
-    cell = eg.split(",")[0]
+    Elements and examples are sorted in the order they are loaded, and implementations in
+    the order they are verified.
 
-    reference, defelement_degree, variant, kwargs = parse_example(eg)
-    assert len(kwargs) == 0
-    symfem_name, symfem_degree, symfem_params = e.get_implementation_string(
-        "symfem",
-        reference,
-        defelement_degree,
-        variant,
-    )
-    assert symfem_degree is not None
-    sym_info = verifications["symfem"](symfem_name, reference, symfem_degree, symfem_params, e, eg)
-    for i in implementations:
-        # Implementations generated from other implementations (eg Basix code generated by Symfem)
-        if i.startswith("*(") and i.endswith(")"):
-            input_code, output_code = i[2:-1].split(" -> ")
-            if e.implemented(output_code) or not e.implemented(input_code):
-                continue
-        # Standard implementations
-        else:
-            input_code = i
-            output_code = i
-
-        if output_code not in results[e.filename]:
-            results[e.filename][output_code] = {
-                "pass": [],
-                "fail": [],
-                "not implemented": [],
+    Args:
+        data: Verification results
+        categoriser: The categoriser that the elements were loaded into
+
+    Returns:
+        The sorted results
+    """
+    elements = {e.filename: e for e in categoriser.elements}
+    element_order = list(elements)
+    impl_order = [output_code(i) for i in verifications]
+    return {
+        e: {
+            impl: {
+                status: sorted(data[e][impl][status], key=elements[e].examples.index)
+                for status in sorted(data[e][impl], key=statuses.index)
             }
+            for impl in sorted(data[e], key=impl_order.index)
+        }
+        for e in sorted(data, key=element_order.index)
+    }
+
+
+def sort_inputs(
+    inputs: dict[str, dict[str, dict[str, dict[str, str]]]], categoriser: Categoriser
+) -> dict[str, dict[str, dict[str, dict[str, str]]]]:
+    """Put verification inputs in the order that a run verifying all examples writes them.
+
+    Args:
+        inputs: The inputs for each verified example
+        categoriser: The categoriser that the elements were loaded into
+
+    Returns:
+        The sorted inputs
+    """
+    elements = {e.filename: e for e in categoriser.elements}
+    element_order = list(elements)
+    impl_order = list(verifications)
+    return {
+        e: {
+            impl: {
+                eg: inputs[e][impl][eg]
+                for eg in sorted(inputs[e][impl], key=elements[e].examples.index)
+            }
+            for impl in sorted(inputs[e], key=impl_order.index)
+        }
+        for e in sorted(inputs, key=element_order.index)
+    }
+
+
+def save_results(
+    data: dict[str, dict[str, dict[str, list[str]]]],
+    metadata: dict[str, typing.Any],
+    inputs: dict[str, dict[str, dict[str, dict[str, str]]]],
+    timings: dict[str, dict[str, TaskTimings]],
+    new_timings: dict[str, dict[str, TaskTimings]],
+    update_history: bool = True,
+):
+    """Save verification results.
+
+    If the results are not added to the history files (because they are the output of one
+    shard), the timings recorded in this run are saved in a separate file and the timings
+    file is not changed, so that every shard of the next run is given the same timings.
+
+    Args:
+        data: Verification results
+        metadata: The date and the version of each implementation
+        inputs: The inputs for each verified example
+        timings: Timings recorded in previous runs
+        new_timings: Timings recorded in this run
+        update_history: Should the results be added to the history files?
+    """
+    with open(settings.verification_json, "w") as f:
+        json.dump({"metadata": metadata, "verification": data}, f)
+    with open(settings.verification_inputs_json, "w") as f:
+        json.dump(
+            {
+                i0: {
+                    i1: {
+                        eg: j2
+                        for eg, j2 in j1.items()
+                        if verification_status(data, i0, i1, eg) is not None
+                    }
+                    for i1, j1 in j0.items()
+                }
+                for i0, j0 in inputs.items()
+            },
+            f,
+        )
+
+    if not update_history:
+        with open(settings.verification_shard_timings_json, "w") as f:
+            json.dump(new_timings, f)
+        return
+
+    # Totals of the timings recorded in this run, for each implementation
+    run_timings: dict[str, dict[str, float]] = {}
+    for e, e_timings in new_timings.items():
+        if e not in timings:
+            timings[e] = {}
+        for eg, task_timings in e_timings.items():
+            if eg not in timings[e]:
+                timings[e][eg] = {}
+            timings[e][eg].update(task_timings)
+            for impl, impl_timings in task_timings.items():
+                if impl not in run_timings:
+                    run_timings[impl] = {"examples": 0}
+                run_timings[impl]["examples"] += 1
+                for key, value in impl_timings.items():
+                    if key == "memory":
+                        run_timings[impl][key] = max(run_timings[impl].get(key, 0), value)
+                    else:
+                        run_timings[impl][key] = run_timings[impl].get(key, 0.0) + value
+    with open(settings.verification_timings_json, "w") as f:
+        json.dump(timings, f)
+
+    try:
+        with open(settings.verification_history_json) as f:
+            history = json.load(f)
+    except FileNotFoundError:
+        history = {}
+    for impl in sorted(set(j for i in data.values() for j in i)):
+        if impl not in history:
+            history[impl] = []
+        history[impl].append(
+            {
+                "date": metadata["date"],
+                "pass": sum(len(i[impl]["pass"]) for i in data.values() if impl in i),
+                "version": metadata[impl]["version"],
+                # Examples that timed out or ran out of memory count as not verified
+                "total": sum(
+                    len(i[impl][status])
+                    for i in data.values()
+                    if impl in i
+                    for status in ["pass", "fail", "timeout", "oom"]
+                ),
+            }
+        )
+    with open(settings.verification_history_json, "w") as f:
+        json.dump(history, f)
+
+    try:
+        with open(settings.verification_timings_history_json) as f:
+            timings_history = json.load(f)
+    except FileNotFoundError:
+        timings_history = {}
+    for impl in sorted(run_timings):
+        if impl not in timings_history:
+            timings_history[impl] = []
+        # Symfem's version is not included in the metadata
+        version = metadata[impl]["version"] if impl in metadata else versions[impl]()
+        timings_history[impl].append(
+            {"date": metadata["date"], "version": version, **run_timings[impl]}
+        )
+    with open(settings.verification_timings_history_json, "w") as f:
+        json.dump(timings_history, f)
+
+
+def merge_shards(shards: list[str], categoriser: Categoriser):
+    """Merge the output of sharded verification runs.
+
+    The merged results are saved in the same way as the results of a single run that
+    verifies all the examples, and are added to the history files. An error is raised if the
+    shards were not given the same examples and timings, or if their outputs do not cover
+    every example exactly once.
+
+    Args:
+        shards: The verification JSON files written by each shard
+        categoriser: The categoriser that the elements were loaded into
+    """
+    shard_data = []
+    metadata: dict[str, typing.Any] = {}
+    inputs: dict[str, dict[str, dict[str, dict[str, str]]]] = {}
+    new_timings: dict[str, dict[str, TaskTimings]] = {}
+    found_shards = []
+    for filename in shards:
+        with open(filename) as f:
+            shard = json.load(f)
+        shard_data.append(shard["verification"])
+        found_shards.append(shard["metadata"].pop("shard"))
+        tasks = shard["metadata"].pop("tasks")
+        if metadata.get("tasks", tasks) != tasks:
+            raise ValueError("Shards were given different examples or timings")
+        metadata["tasks"] = tasks
+        date = shard["metadata"].pop("date")
+        metadata["date"] = min(metadata.get("date", date), date)
+        points = shard["metadata"].pop("points")
+        if metadata.get("points", points) != points:
+            raise ValueError("Shards used different tabulation points")
+        metadata["points"] = points
+        for impl, info in shard["metadata"].items():
+            if impl in metadata and metadata[impl] != info:
+                raise ValueError(f"Shards used different versions of {impl}")
+            metadata[impl] = info
+        with open(f"{filename[:-5]}-inputs.json") as f:
+            for e, e_inputs in json.load(f).items():
+                for impl, impl_inputs in e_inputs.items():
+                    inputs.setdefault(e, {}).setdefault(impl, {}).update(impl_inputs)
+        with open(f"{filename[:-5]}-shard-timings.json") as f:
+            for e, e_timings in json.load(f).items():
+                for eg, task_timings in e_timings.items():
+                    if eg in new_timings.get(e, {}):
+                        raise ValueError(f"{e} {eg} was verified by more than one shard")
+                    new_timings.setdefault(e, {})[eg] = task_timings
+
+    shard_count = int(found_shards[0].split("/")[1])
+    if sorted(found_shards) != sorted(f"{i}/{shard_count}" for i in range(1, shard_count + 1)):
+        raise ValueError(f"Expected one output from each of {shard_count} shards")
+    verified = sum(len(e_timings) for e_timings in new_timings.values())
+    if verified != metadata["tasks"]["count"]:
+        raise ValueError(f"The shards verified {verified} of {metadata['tasks']['count']} examples")
+
+    try:
+        with open(settings.verification_timings_json) as f:
+            timings = json.load(f)
+    except FileNotFoundError:
+        timings = {}
+
+    data = sort_results(combine_results(shard_data), categoriser)
+    metadata = {
+        "date": metadata["date"],
+        "points": metadata["points"],
+        **{i: metadata[i] for i in sorted(metadata) if i not in ["date", "points", "tasks"]},
+    }
+    save_results(data, metadata, sort_inputs(inputs, categoriser), timings, new_timings)
 
-        # Do the verification
-        try:
-            impl_name, impl_degree, impl_params = e.get_implementation_string(
-                input_code,
-                reference,
-                defelement_degree,
-                variant,
-            )
-            assert impl_degree is not None
-            vinfo = verifications[i](impl_name, reference, impl_degree, impl_params, e, eg)
-            v, info = verify(cell, vinfo, sym_info)
-            if v:
-                results[e.filename][output_code]["pass"].append(eg)
-                print(f"{e.filename} {i} {eg} {green}\u2713{default}")
-            else:
-                results[e.filename][output_code]["fail"].append(eg)
-                print(f"{e.filename} {i} {eg} {red}\u2715{default}")
-                if print_reasons:
-                    print(f"  {info}")
-        except ImportError as err:
-            if skip_missing:
-                print(f"{output_code} not installed")
-            else:
-                raise err
-        except NotImplementedError:
-            results[e.filename][output_code]["not implemented"].append(eg)
-            print(f"{e.filename} {i} {eg} {blue}\u2013{default}")
-        except (KeyboardInterrupt, RuntimeError) as err:
-            raise err
-        except BaseException as err:
-            results[e.filename][output_code]["fail"].append(eg)
-            print(f"{e.filename} {i} {eg} {red}\u2715{default}")
-            if print_reasons:
-                print(f"  {type(err).__name__}: {err}")
 
-    return results
+def _run_task(
+    task: tuple[int, typing.Callable[[typing.Any], typing.Any], typing.Any],
+) -> tuple[int, typing.Any]:
+    """Run a task and return its position in the list of tasks.
+
+    Args:
+        task: The position of the task, the function that runs it, and the task
+
+    Returns:
+        The position of the task and the result of running it
+    """
+    n, function, t = task
+    return n, function(t)
 
 
 if __name__ == "__main__":
     start_all = datetime.now()
 
+    if len(sys.argv) > 1 and sys.argv[1] == "merge":
+        parser = argparse.ArgumentParser(
+            prog="verify.py merge", description="Merge the output of sharded verification runs"
+        )
+        parser.add_argument("destination", metavar="destination", help="Name of output json file.")
+        parser.add_argument(
+            "shards", metavar="shards", nargs="+", help="Json files written by each shard."
+        )
+        args = parser.parse_args(sys.argv[2:])
+        settings.set_verification_json(args.destination)
+
+        categoriser = Categoriser()
+        categoriser.load_references(os.path.join(settings.data_path, "references"))
+        categoriser.load_families(os.path.join(settings.data_path, "families"))
+        categoriser.load_folder(settings.element_path)
+
+        merge_shards(args.shards, categoriser)
+        sys.exit()
+
     parser = argparse.ArgumentParser(description="Verify elements")
     parser.add_argument(
         "destination",
@@ -136,12 +1805,121 @@ if __name__ == "__main__":
     parser.add_argument(
         "--impl", metavar="impl", default=None, help="libraries to run verification for"
     )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Verify without using cached Symfem tables."
+    )
+    parser.add_argument(
+        "--sketch",
+        action="store_true",
+        help="Use randomised sketches to find failing examples quickly.",
+    )
+    parser.add_argument(
+        "--oversampling",
+        metavar="oversampling",
+        default=None,
+        help="The ratio between the number of tabulation points and the number of DOFs, or "
+        "'none' to use the same points for every element.",
+    )
+    parser.add_argument(
+        "--timeout",
+        metavar="timeout",
+        default=None,
+        help="The maximum time in seconds to spend verifying each example (or each "
+        "implementation of an example if --parallel-implementations is used).",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        metavar="memory_limit",
+        default=None,
+        help="The maximum amount (eg 4G) by which verifying an example can increase the "
+        "resident memory of a process.",
+    )
+    parser.add_argument(
+        "--parallel-implementations",
+        action="store_true",
+        help="Verify each implementation of each example as a separate task, so that the "
+        "implementations of an example are verified in parallel.",
+    )
+    parser.add_argument(
+        "--server-processes",
+        metavar="server_processes",
+        default=None,
+        help="Run each library in this many long-lived server processes, and verify examples "
+        "in --processes threads that send requests to the servers.",
+    )
+    parser.add_argument(
+        "--max-tasks-per-child",
+        metavar="max_tasks_per_child",
+        default=None,
+        help="The number of examples each worker process verifies before it is replaced.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Save cProfile stats for examples that take longer than --profile-threshold.",
+    )
+    parser.add_argument(
+        "--profile-threshold",
+        metavar="profile_threshold",
+        default=None,
+        help="The time in seconds above which cProfile stats for an example are saved.",
+    )
+    parser.add_argument(
+        "--degrees",
+        metavar="degrees",
+        default=None,
+        help="Verify every degree from k0 to k1-1 (given as k0:k1) instead of the examples, and "
+        "save the results and timings in separate json files.",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="shard",
+        default=None,
+        help="Only verify one shard of the examples (eg 2/4). Every shard must be given the "
+        "same timings file. Use 'verify.py merge' to combine the outputs of the shards.",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="checkpoint",
+        default=None,
+        help="Resume an interrupted run from its checkpoint file.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only verify examples whose definition or library versions have changed.",
+    )
 
     args = parser.parse_args()
     if args.destination is not None:
         settings.set_verification_json(args.destination)
     if args.processes is not None:
         settings.set_processes(int(args.processes))
+    if args.no_cache:
+        settings.caching = False
+    if args.sketch:
+        settings.verification_sketch = True
+    if args.oversampling is not None:
+        settings.verification_oversampling = (
+            None if args.oversampling == "none" else float(args.oversampling)
+        )
+    if args.timeout is not None:
+        settings.verification_timeout = float(args.timeout)
+    if args.memory_limit is not None:
+        settings.verification_memory_limit = parse_size(args.memory_limit)
+    if args.parallel_implementations:
+        settings.verification_parallel_implementations = True
+    if args.server_processes is not None:
+        if args.parallel_implementations:
+            raise ValueError("--parallel-implementations cannot be used with --server-processes")
+        settings.verification_server_processes = int(args.server_processes)
+    if args.max_tasks_per_child is not None:
+        settings.verification_max_tasks_per_child = int(args.max_tasks_per_child)
+    if args.profile:
+        settings.verification_profile_path = f"{settings.verification_json[:-5]}-profiles"
+        os.makedirs(settings.verification_profile_path, exist_ok=True)
+    if args.profile_threshold is not None:
+        settings.verification_profile_threshold = float(args.profile_threshold)
     if args.test is None:
         test_elements = None
     elif args.test == "auto":
@@ -178,9 +1956,128 @@ if __name__ == "__main__":
     # Load elements from .def files
     categoriser.load_folder(settings.element_path)
 
+    if args.degrees is not None:
+        k0, k1 = [int(i) for i in args.degrees.split(":")]
+        candidates = [
+            i
+            for i in verifications
+            if i != "symfem" and (test_implementations is None or i in test_implementations)
+        ]
+        sweeps = [
+            sweep
+            for e in categoriser.elements
+            if test_elements is None or e.filename in test_elements
+            for sweep in degree_sweeps(e, range(k0, k1), candidates)
+        ]
+        missing = warm_up(["symfem"] + sorted(set(i for sweep in sweeps for i in sweep[2])))
+        sweeps = [
+            (e, examples, [i for i in implementations if i not in missing])
+            for e, examples, implementations in sweeps
+        ]
+        sweeps = [sweep for sweep in sweeps if len(sweep[2]) > 0]
+
+        # The timings of the sweeps are saved separately, as they include examples that are
+        # not verified in normal runs. Both are used to estimate the cost of each sweep
+        try:
+            with open(settings.verification_degrees_timings_json) as f:
+                degrees_timings = json.load(f)
+        except FileNotFoundError:
+            degrees_timings = {}
+        try:
+            with open(settings.verification_timings_json) as f:
+                timings = json.load(f)
+        except FileNotFoundError:
+            timings = {}
+        for e_name, e_timings in degrees_timings.items():
+            timings.setdefault(e_name, {}).update(e_timings)
+
+        if settings.processes != 1:
+            import multiprocessing
+
+            multiprocessing.set_start_method("fork")
+        if settings.verification_server_processes is not None:
+            start_servers(
+                ["symfem"] + sorted(set(i for sweep in sweeps for i in sweep[2])),
+                categoriser.elements,
+            )
+
+        # The cheapest sweeps are started first, so that results for most elements are
+        # available early
+        sweep_results: list[typing.Any] = [None for _ in sweeps]
+        for n, r in run_tasks(
+            sweeps,
+            [
+                sum(estimate_cost((e, eg, implementations, {}), timings) for eg in examples)
+                for e, examples, implementations in sweeps
+            ],
+            verify_sweep,
+            time_limits=None
+            if settings.verification_timeout is None
+            else [settings.verification_timeout * len(examples) for _, examples, _ in sweeps],
+            timed_out=timed_out_sweep,
+            cheapest_first=True,
+        ):
+            sweep_results[n] = r
+        stop_servers()
+
+        degrees_data = combine_results([r[0] for r in sweep_results])
+        degrees_metadata: dict[str, typing.Any] = {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "degrees": args.degrees,
+            "points": {
+                "oversampling": settings.verification_oversampling,
+                "grid sizes": grid_sizes,
+            },
+        }
+        for impl in sorted(set(j for i in degrees_data.values() for j in i)):
+            degrees_metadata[impl] = {"version": versions[impl]()}
+        with open(settings.verification_degrees_json, "w") as f:
+            json.dump({"metadata": degrees_metadata, "verification": degrees_data}, f)
+
+        for sweep, (_, sweep_timings) in zip(sweeps, sweep_results):
+            e = sweep[0]
+            if e.filename not in degrees_timings:
+                degrees_timings[e.filename] = {}
+            for eg, task_timings in sweep_timings.items():
+                if eg not in degrees_timings[e.filename]:
+                    degrees_timings[e.filename][eg] = {}
+                degrees_timings[e.filename][eg].update(task_timings)
+        with open(settings.verification_degrees_timings_json, "w") as f:
+            json.dump(degrees_timings, f)
+        sys.exit()
+
+    impl_versions: dict[str, str] = {}
+
+    def impl_version(impl: str) -> str:
+        """Get the version of an implementation.
+
+        Args:
+            impl: The implementation
+
+        Returns:
+            The version
+        """
+        if impl not in impl_versions:
+            impl_versions[impl] = versions[impl]()
+        return impl_versions[impl]
+
+    previous_data: dict[str, dict[str, dict[str, list[str]]]] = {}
+    previous_inputs: dict[str, dict[str, dict[str, dict[str, str]]]] = {}
+    if args.incremental:
+        try:
+            with open(settings.verification_json) as f:
+                previous_data = json.load(f)["verification"]
+            with open(settings.verification_inputs_json) as f:
+                previous_inputs = json.load(f)
+        except FileNotFoundError:
+            pass
+
     elements_to_verify = []
+    inputs: dict[str, dict[str, dict[str, dict[str, str]]]] = {}
+    verification_hash = verification_source_hash()
     for e in categoriser.elements:
         if test_elements is None or e.filename in test_elements:
+            definition_hash = content_hash(e.data)
             for eg in e.examples:
                 implementations = [
                     i
@@ -189,66 +2086,155 @@ if __name__ == "__main__":
                     and e.implemented(i)
                     and (test_implementations is None or i in test_implementations)
                 ]
-                if len(implementations) > 0:
-                    elements_to_verify.append((e, eg, implementations))
-
-    if settings.processes == 1:
-        results = [verify_example(e) for e in elements_to_verify]
-    else:
-        import multiprocessing
+                if len(implementations) == 0:
+                    continue
+                reference, degree, variant, _ = parse_example(eg)
+                symfem_name = e.get_implementation_string("symfem", reference, degree, variant)[0]
+                previous = {}
+                for i in implementations:
+                    if e.filename not in inputs:
+                        inputs[e.filename] = {}
+                    if i not in inputs[e.filename]:
+                        inputs[e.filename][i] = {}
+                    inputs[e.filename][i][eg] = {
+                        "definition": definition_hash,
+                        "version": impl_version(i),
+                        # Symfem is installed from its main branch, so its version is not
+                        # changed every time its source is
+                        "symfem": symfem_element_source_hash(symfem_name, reference),
+                        "verification": verification_hash,
+                        "oversampling": str(settings.verification_oversampling),
+                    }
+                    status = verification_status(previous_data, e.filename, i, eg)
+                    # Examples that timed out or ran out of memory are always tried again
+                    if (
+                        status not in [None, "timeout", "oom"]
+                        and previous_inputs.get(e.filename, {}).get(i, {}).get(eg)
+                        == inputs[e.filename][i][eg]
+                    ):
+                        previous[i] = status
+                elements_to_verify.append((e, eg, implementations, previous))
+    if args.shard is not None:
+        shard, shards = [int(i) for i in args.shard.split("/")]
+        if not 1 <= shard <= shards:
+            raise ValueError(f"Invalid shard: {args.shard}")
+    if args.incremental:
+        print(
+            f"Reusing {sum(len(i[3]) for i in elements_to_verify)} of "
+            f"{sum(len(i[2]) for i in elements_to_verify)} previous results"
+        )
 
-        multiprocessing.set_start_method("fork")
+    try:
+        with open(settings.verification_timings_json) as f:
+            timings = json.load(f)
+    except FileNotFoundError:
+        timings = {}
 
-        with multiprocessing.Pool(settings.processes) as p:
-            results = p.map(verify_example, elements_to_verify)
+    # Libraries are imported before any work is started, and implementations that are not
+    # installed are not verified
+    missing = warm_up(
+        ["symfem"]
+        + sorted(set(i for task in elements_to_verify for i in task[2] if i not in task[3]))
+    )
+    if len(missing) > 0:
+        elements_to_verify = [
+            (e, eg, [i for i in implementations if i not in missing], previous)
+            for e, eg, implementations, previous in elements_to_verify
+        ]
+        elements_to_verify = [task for task in elements_to_verify if len(task[2]) > 0]
 
-    data: dict[str, dict[str, dict[str, list[str]]]] = {}
-    for r in results:
-        for i0, j0 in r.items():
-            if i0 not in data:
-                data[i0] = {}
-            for i1, j1 in j0.items():
-                if i1 not in data[i0]:
-                    data[i0][i1] = {}
-                for i2, j2 in j1.items():
-                    if i2 not in data[i0][i1]:
-                        data[i0][i1][i2] = []
-                    data[i0][i1][i2] += j2
+    if args.shard is not None:
+        # The merge checks that every shard was given the same examples and cost estimates, so
+        # that the shards between them verify every example exactly once
+        shard_metadata = {
+            "digest": content_hash(
+                [
+                    [task[0].filename, *task[1:], estimate_cost(task, timings)]
+                    for task in elements_to_verify
+                ]
+            ),
+            "count": len(elements_to_verify),
+        }
+        elements_to_verify = [
+            elements_to_verify[n] for n in shard_tasks(elements_to_verify, timings, shard, shards)
+        ]
+        print(f"Shard {args.shard}: verifying {len(elements_to_verify)} examples")
 
+    # Results are written to the checkpoint as soon as each example is verified, so that an
+    # interrupted run can be resumed
     now = datetime.now().strftime("%Y-%m-%d")
-    metadata: dict[str, typing.Any] = {"date": now}
+    results: list[typing.Any] = [None for _ in elements_to_verify]
+    checkpoint: list[dict[str, typing.Any]] = []
+    if args.resume is not None:
+        settings.verification_checkpoint_jsonl = args.resume
+        header, entries = load_checkpoint(args.resume)
+        now = header["date"]
+        checkpointed = {(entry["element"], entry["example"]): entry for entry in entries}
+        for n, task in enumerate(elements_to_verify):
+            entry = checkpointed.get((task[0].filename, task[1]))
+            if (
+                entry is not None
+                and entry["implementations"] == task[2]
+                and entry["previous"] == task[3]
+            ):
+                results[n] = (entry["results"], entry["timings"])
+                checkpoint.append(entry)
+        print(f"Resuming: {len(checkpoint)} of {len(results)} examples already verified")
 
-    try:
-        with open(settings.verification_history_json) as f:
-            history = json.load(f)
-    except FileNotFoundError:
-        history = {}
+    if settings.processes != 1:
+        import multiprocessing
 
-    for impl in set(j for i in data.values() for j in i):
-        metadata[impl] = {"version": versions[impl]()}
-        if impl not in history:
-            history[impl] = []
-        history[impl].append(
-            {
-                "date": now,
-                "pass": sum(len(i[impl]["pass"]) for i in data.values() if impl in i),
-                "version": versions[impl](),
-                "total": sum(
-                    len(i[impl]["pass"]) + len(i[impl]["fail"]) for i in data.values() if impl in i
-                ),
-            }
-        )
+        multiprocessing.set_start_method("fork")
 
-    with open(settings.verification_json, "w") as f:
-        json.dump(
-            {
-                "metadata": metadata,
-                "verification": data,
-            },
-            f,
+    to_verify = [n for n, r in enumerate(results) if r is None]
+    if settings.verification_server_processes is not None:
+        start_servers(
+            ["symfem"]
+            + sorted(
+                set(
+                    i
+                    for n in to_verify
+                    for i in elements_to_verify[n][2]
+                    if i not in elements_to_verify[n][3]
+                )
+            ),
+            categoriser.elements,
         )
-    with open(settings.verification_history_json, "w") as f:
-        json.dump(history, f)
+    with open(settings.verification_checkpoint_jsonl, "w") as f:
+        for line in [{"date": now}] + checkpoint:
+            f.write(json.dumps(line) + "\n")
+        f.flush()
+        for n, r in run_examples([elements_to_verify[n] for n in to_verify], timings):
+            results[to_verify[n]] = r
+            f.write(json.dumps(checkpoint_entry(elements_to_verify[to_verify[n]], r)) + "\n")
+            f.flush()
+    stop_servers()
+
+    new_timings: dict[str, dict[str, TaskTimings]] = {}
+    for task, (_, task_timings) in zip(elements_to_verify, results):
+        e, eg = task[:2]
+        if e.filename not in new_timings:
+            new_timings[e.filename] = {}
+        new_timings[e.filename][eg] = task_timings
+
+    data = sort_results(combine_results([result[0] for result in results]), categoriser)
+    metadata: dict[str, typing.Any] = {
+        "date": now,
+        "points": {"oversampling": settings.verification_oversampling, "grid sizes": grid_sizes},
+    }
+    for impl in sorted(set(j for i in data.values() for j in i)):
+        metadata[impl] = {"version": versions[impl]()}
+
+    if args.shard is None:
+        save_results(data, metadata, sort_inputs(inputs, categoriser), timings, new_timings)
+    else:
+        # The history and timings are updated when the shards are merged, and each shard only
+        # saves the timings it recorded
+        metadata["shard"] = args.shard
+        metadata["tasks"] = shard_metadata
+        save_results(data, metadata, inputs, {}, new_timings, False)
+
+    tidy_array_cache([array_key_prefix()])
 
     if assert_passing:
         for d in data.values():